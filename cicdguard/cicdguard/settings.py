@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'main', # management commands, e.g. install_schema
 ]
 
 MIDDLEWARE = [
@@ -88,6 +89,26 @@ DATABASES = {
 }
 
 
+# Query result cache of the main app, see main/query_cache.py. Entries are keyed by scan generation,
+# the timeout only bounds how long results of older generations keep their space
+# Set CICDGUARD_CACHE_DIR to share the cache between server processes
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'queries': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cicdguard-queries',
+        'TIMEOUT': int(os.getenv("CICDGUARD_CACHE_TIMEOUT", "86400")),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+if os.getenv("CICDGUARD_CACHE_DIR"):
+    CACHES['queries']['BACKEND'] = 'django.core.cache.backends.filebased.FileBasedCache'
+    CACHES['queries']['LOCATION'] = os.getenv("CICDGUARD_CACHE_DIR")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
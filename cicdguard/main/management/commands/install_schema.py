@@ -0,0 +1,172 @@
+import inspect
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from neomodel import StructuredNode, UniqueIdProperty, db
+
+from main import models
+
+# Global Variables
+SHOW_INDEXES_QUERY = "SHOW INDEXES YIELD name, labelsOrTypes, properties, type, owningConstraint RETURN name, labelsOrTypes, properties, type, owningConstraint"
+SHOW_CONSTRAINTS_QUERY = "SHOW CONSTRAINTS YIELD labelsOrTypes, properties, type RETURN labelsOrTypes, properties, type"
+CREATE_CONSTRAINT_QUERY = "CREATE CONSTRAINT $name IF NOT EXISTS FOR (n:$label) REQUIRE n.$key IS UNIQUE"
+CREATE_INDEX_QUERY = "CREATE INDEX $name IF NOT EXISTS FOR (n:$label) ON (n.$key)"
+DROP_INDEX_QUERY = "DROP INDEX $name IF EXISTS"
+DROP_CONSTRAINT_QUERY = "DROP CONSTRAINT $name IF EXISTS"
+DUPLICATES_QUERY = "MATCH (n:$label) WHERE n.$key IS NOT NULL WITH n.$key AS value, count(*) AS copies WHERE copies > 1 RETURN count(value), sum(copies)"
+AWAIT_INDEXES_QUERY = "CALL db.awaitIndexes($timeout)"
+LOOKUP_INDEX_TYPES = ["RANGE", "BTREE"] # index types an equality MERGE can use
+AWAIT_TIMEOUT = 600
+RETIRED_SCHEMA = [("Action_Command", "command")] # lookup keys no longer declared, their constraint or index is dropped on install
+
+# the benchmark works on its own label so that it never touches scanned data
+BENCHMARK_LABEL = "Schema_Benchmark"
+BENCHMARK_SEED_QUERY = "UNWIND range($start, $end) AS i CREATE (:Schema_Benchmark {name: 'node-' + toString(i)})"
+BENCHMARK_UPSERT_QUERY = "UNWIND $rows AS row MERGE (n:Schema_Benchmark {name: row.value}) SET n += row.props" # same shape as GraphWriter's node batches
+BENCHMARK_CLEANUP_QUERY = "MATCH (n:Schema_Benchmark) WITH n LIMIT 10000 DETACH DELETE n RETURN count(*)"
+BENCHMARK_BATCH_SIZE = 500
+BENCHMARK_ROUNDS = 20
+
+
+def declared_schema():
+	# (label, property, "unique" or "index") for every unique_index/index in main.models, uid isn't looked up by anything
+	schema = []
+	for name, cls in inspect.getmembers(models, inspect.isclass):
+		if not issubclass(cls, StructuredNode) or cls is StructuredNode or cls.__module__ != models.__name__:
+			continue
+		for key, prop in cls.defined_properties(aliases=False, rels=False).items():
+			if isinstance(prop, UniqueIdProperty):
+				continue
+			if prop.unique_index:
+				schema.append((cls.__label__, key, "unique"))
+			elif prop.index:
+				schema.append((cls.__label__, key, "index"))
+	return schema
+
+def installed_schema():
+	# (label, property) -> {"kind": "unique" or "index", "index": name of a plain index}
+	installed = {}
+	results, columns = db.cypher_query(SHOW_INDEXES_QUERY)
+	for name, labels, properties, index_type, owner in results:
+		if labels and properties and len(properties) == 1 and index_type in LOOKUP_INDEX_TYPES and not owner:
+			installed[(labels[0], properties[0])] = {"kind": "index", "index": name}
+	results, columns = db.cypher_query(SHOW_CONSTRAINTS_QUERY)
+	for labels, properties, constraint_type in results:
+		if labels and properties and len(properties) == 1 and "UNIQUE" in constraint_type:
+			installed.setdefault((labels[0], properties[0]), {})["kind"] = "unique"
+	return installed
+
+def schema_name(label, key):
+	# same naming as the Finding schema the GraphWriter installs, e.g. finding_fid
+	return label.lower() + "_" + key
+
+
+class Command(BaseCommand):
+	help = "Installs and verifies the Neo4j indexes and uniqueness constraints for every lookup key declared in main.models"
+
+	def add_arguments(self, parser):
+		parser.add_argument("--check", action="store_true", help="Only verify, exit with an error when anything is missing")
+		parser.add_argument("--benchmark", type=int, default=0, metavar="NODES", help="Time upserts against NODES existing nodes without and with an index on a scratch label")
+
+	def handle(self, *args, **options):
+		declared = declared_schema()
+		if options["check"]:
+			missing = self.verify(declared)
+			if missing:
+				raise CommandError(str(len(missing)) + " of " + str(len(declared)) + " lookup keys aren't indexed")
+			return
+
+		if options["benchmark"] > 0:
+			self.benchmark(options["benchmark"])
+
+		for label, key in RETIRED_SCHEMA:
+			db.cypher_query(DROP_CONSTRAINT_QUERY.replace("$name", schema_name(label, key)))
+			db.cypher_query(DROP_INDEX_QUERY.replace("$name", schema_name(label, key)))
+
+		installed = installed_schema()
+		created = 0
+		for label, key, kind in declared:
+			current = installed.get((label, key), {})
+			if current.get("kind") == "unique" or current.get("kind") == kind:
+				continue
+			if kind == "unique" and self.install_constraint(label, key, current):
+				created += 1
+				continue
+			# plain index, or the fallback when the existing data breaks uniqueness
+			if current.get("kind") != "index":
+				db.cypher_query(CREATE_INDEX_QUERY.replace("$name", schema_name(label, key)).replace("$label", label).replace("$key", key))
+				created += 1
+		db.cypher_query(AWAIT_INDEXES_QUERY, {"timeout": AWAIT_TIMEOUT})
+		self.stdout.write("[*] " + str(created) + " indexes and constraints created")
+		self.verify(declared)
+
+	def install_constraint(self, label, key, current):
+		results, columns = db.cypher_query(DUPLICATES_QUERY.replace("$label", label).replace("$key", key))
+		values, copies = results[0]
+		if values:
+			self.stdout.write(self.style.WARNING("[?] " + label + "." + key + ": " + str(values) + " values are shared by " + str(copies) + " nodes, indexing without uniqueness"))
+			return False
+		if current.get("index"):
+			# a uniqueness constraint brings its own index and can't be created next to one on the same property
+			db.cypher_query(DROP_INDEX_QUERY.replace("$name", current["index"]))
+		db.cypher_query(CREATE_CONSTRAINT_QUERY.replace("$name", schema_name(label, key)).replace("$label", label).replace("$key", key))
+		return True
+
+	def verify(self, declared):
+		installed = installed_schema()
+		missing = []
+		for label, key, kind in declared:
+			current = installed.get((label, key), {}).get("kind")
+			if current == "unique" or current == kind:
+				self.stdout.write(self.style.SUCCESS("[+] " + label + "." + key + ": " + current))
+			elif current == "index":
+				self.stdout.write(self.style.WARNING("[?] " + label + "." + key + ": index, declared unique"))
+			else:
+				self.stdout.write(self.style.ERROR("[-] " + label + "." + key + ": missing " + kind))
+				missing.append((label, key, kind))
+		return missing
+
+	def benchmark(self, count):
+		"""
+		Upsert throughput before and after indexing, on BENCHMARK_LABEL seeded
+		with `count` nodes: every batch merges half existing and half new keys.
+		"""
+		name = schema_name(BENCHMARK_LABEL, "name")
+		db.cypher_query(DROP_CONSTRAINT_QUERY.replace("$name", name))
+		self.cleanup()
+		for start in range(0, count, 10000):
+			db.cypher_query(BENCHMARK_SEED_QUERY, {"start": start, "end": min(start + 10000, count) - 1})
+
+		before = self.time_upserts(count, count)
+		db.cypher_query(CREATE_CONSTRAINT_QUERY.replace("$name", name).replace("$label", BENCHMARK_LABEL).replace("$key", "name"))
+		db.cypher_query(AWAIT_INDEXES_QUERY, {"timeout": AWAIT_TIMEOUT})
+		after = self.time_upserts(count, count + BENCHMARK_ROUNDS * BENCHMARK_BATCH_SIZE)
+
+		db.cypher_query(DROP_CONSTRAINT_QUERY.replace("$name", name))
+		self.cleanup()
+		self.stdout.write("[*] Upserts against " + str(count) + " nodes: " + str(round(before)) + "/s without index, " + str(round(after)) + "/s with index (" + str(round(after / before, 1)) + "x)")
+
+	def time_upserts(self, existing, fresh):
+		# fresh is where the new keys of this run start, so the second run doesn't merge into the first one's nodes
+		picker = random.Random(existing)
+		upserts = 0
+		started = time.time()
+		for batch in range(BENCHMARK_ROUNDS):
+			rows = []
+			for i in range(BENCHMARK_BATCH_SIZE):
+				if i % 2:
+					value = "node-" + str(picker.randrange(existing))
+				else:
+					value = "node-" + str(fresh + batch * BENCHMARK_BATCH_SIZE + i)
+				rows.append({"value": value, "props": {"name": value}})
+			with db.transaction:
+				db.cypher_query(BENCHMARK_UPSERT_QUERY, {"rows": rows})
+			upserts += len(rows)
+		return upserts / (time.time() - started)
+
+	def cleanup(self):
+		deleted = 1
+		while deleted:
+			results, columns = db.cypher_query(BENCHMARK_CLEANUP_QUERY)
+			deleted = results[0][0]
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main import query_cache
+
+
+class Command(BaseCommand):
+	help = "Drops every cached graph and findings query result, the next requests read Neo4j again"
+
+	def handle(self, *args, **options):
+		query_cache.purge()
+		self.stdout.write(self.style.SUCCESS("[+] Query cache purged (" + query_cache.query_cache().__class__.__name__ + ")"))
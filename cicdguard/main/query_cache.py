@@ -0,0 +1,76 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from neomodel import db
+
+# Global Variables
+QUERY_CACHE_ALIAS = "queries"
+GENERATION_QUERY = "MATCH (c:Scan_Counter {name: 'scans'}) RETURN c.generation, c.live"
+GENERATION_CHECK_INTERVAL = 5 # seconds a generation read from Neo4j is trusted before asking again
+STATS_KEYS = ["cicdguard:stats:hits", "cicdguard:stats:misses"]
+
+GENERATION = {"value": None, "live": [], "checked": 0.0}
+
+
+def query_cache():
+	return caches[QUERY_CACHE_ALIAS]
+
+def current_generation():
+	# every scanner bumps Scan_Counter.generation when its GraphWriter closes
+	now = time.time()
+	if GENERATION["value"] is None or now - GENERATION["checked"] > GENERATION_CHECK_INTERVAL:
+		results, columns = db.cypher_query(GENERATION_QUERY)
+		GENERATION["value"] = results[0][0] if results and results[0][0] is not None else 0
+		GENERATION["live"] = results[0][1] if results and results[0][1] is not None else []
+		GENERATION["checked"] = now
+	return GENERATION["value"]
+
+def live_generations():
+	# the published scan generation of every scanner and source, read together with the generation they belong to
+	current_generation()
+	return GENERATION["live"]
+
+def count(key):
+	cache = query_cache()
+	if not cache.add(key, 1, timeout=None):
+		try:
+			cache.incr(key)
+		except ValueError:
+			cache.set(key, 1, timeout=None) # evicted between add() and incr()
+
+def cached_query(name, params, compute):
+	"""
+	Result of compute() for the given query name and parameters, served from
+	the query cache while no scan has finished since it was stored. The scan
+	generation is part of the key, so a new scan makes older entries
+	unreachable and they age out with the backend's timeout.
+	"""
+	digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+	key = "cicdguard:" + name + ":" + str(current_generation()) + ":" + digest
+	cache = query_cache()
+	result = cache.get(key)
+	if result is not None:
+		count(STATS_KEYS[0])
+		return result
+	count(STATS_KEYS[1])
+	result = compute()
+	cache.set(key, result)
+	return result
+
+def stats():
+	hits, misses = [query_cache().get(key, 0) for key in STATS_KEYS]
+	cachestats = {}
+	cachestats["generation"] = current_generation()
+	cachestats["hits"] = hits
+	cachestats["misses"] = misses
+	cachestats["hit_ratio"] = round(float(hits) / (hits + misses), 4) if hits + misses else 0.0
+	cachestats["backend"] = query_cache().__class__.__name__
+	return cachestats
+
+def purge():
+	# drops every cached result and the counters, the next request reads the generation again
+	query_cache().clear()
+	GENERATION["value"] = None
+	return
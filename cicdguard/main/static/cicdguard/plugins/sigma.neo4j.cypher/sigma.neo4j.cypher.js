@@ -80,7 +80,15 @@
                 "action": "\uf1fa",
                 "organization": "\uf140",
                 "jenkins": "\uf3b6",
-                "bug": "\uf188"
+                "bug": "\uf188",
+                "summary": "\uf247"
+                };
+                // border colour of a Summary node by the worst finding of its members
+                var severityColors = {
+                "critical": "#FF0000",
+                "high": "#FF8C00",
+                "medium": "#FFD700",
+                "low": "#3971ac"
                 };
 
                 var fa_icon_unicode = icons[node.labels[0].toLowerCase()];
@@ -131,7 +139,8 @@
 
                 var label = node.labels[0].concat(node.properties)
 
-                if (node.properties.affected_vulns.toLowerCase().includes("$")){
+                // findings are Finding nodes linked to the entity, older scans kept them in "$" separated strings
+                if (node.labels[0] == "Finding" || String(node.properties.affected_vulns || "").includes("$")){
                     fa_icon_unicode = icons["bug"];
                     nodeminsize = 15;
                     nodesize = 15;
@@ -140,16 +149,30 @@
                     // label = 
                 }
 
+                // layout_x/layout_y come from scripts/graph_layout.py, nodes it hasn't placed yet start anywhere
+                var placed = node.properties.layout_x != null && node.properties.layout_y != null;
+
+                if (node.labels[0] == "Summary"){
+                    // collapsed builds, steps and commands or members, see GRAPH_AGGREGATES in views.py
+                    nodecolor = "#808080";
+                    nodesize = Math.min(nodeminsize + Math.log(node.properties.total + 1) * 2, nodemaxsize);
+                    if (node.properties.worst_severity){
+                        nodebordercolor = severityColors[node.properties.worst_severity];
+                        nodeborderwidth = 3;
+                    }
+                }
+
                 var sigmaNode =  {
                     id : node.id,
                     // label : node.labels[0],
-                    x : Math.random(),// (node.properties.distance - 1) + radius * (Math.cos(angle * Math.PI / 180)) + stretch, //h+r*cos(a)
-                    y : Math.random(),//radius * Math.sin(angle * Math.PI / 180), //k+r*sin(a), where k = 0
+                    x : placed ? Number(node.properties.layout_x) : Math.random(),// (node.properties.distance - 1) + radius * (Math.cos(angle * Math.PI / 180)) + stretch, //h+r*cos(a)
+                    y : placed ? Number(node.properties.layout_y) : Math.random(),//radius * Math.sin(angle * Math.PI / 180), //k+r*sin(a), where k = 0
                     size: nodesize,
                     maxNodeSize: nodemaxsize,
                     minNodeSize: nodeminsize,
                     neo4j_labels : node.labels,
                     neo4j_data : node.properties,
+                    placed : placed,
                     borderColor: nodebordercolor,
                     color: nodecolor,
                     icon: {
@@ -5,5 +5,10 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
-    path('vulnerabilities',views.vulnerabilities,name="vulnerabilities")
+    path('vulnerabilities',views.vulnerabilities,name="vulnerabilities"),
+    path('vulnerabilities/data',views.vulnerabilities_data,name="vulnerabilities_data"),
+    path('graph',views.graph,name="graph"),
+    path('graph/expand',views.graph_expand,name="graph_expand"),
+    path('cache/stats',views.cache_stats,name="cache_stats"),
+    path('cache/purge',views.cache_purge,name="cache_purge")
 ]
\ No newline at end of file
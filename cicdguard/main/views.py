@@ -1,11 +1,86 @@
 from django.shortcuts import render
 
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.html import escape
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_POST
 from django.template import RequestContext
 
 from .models import *
+from . import query_cache
+from neomodel import db
 import re
 
+# one round trip per page: total from Scan_Counter.visible_findings (counted when a scan generation is published, the label count
+# store before any was), filtered count only when a filter is set, and the page itself.
+# The IS NOT NULL predicate on the sort key lets Neo4j read the page in index order instead of sorting every finding
+FINDINGS_PAGE_QUERY = "OPTIONAL MATCH (c:Scan_Counter {name: 'scans'}) CALL { MATCH (n:Finding) RETURN count(n) AS stored } WITH coalesce(c.visible_findings, stored) AS total $filtered_clause CALL { MATCH (f:Finding) WHERE $where_clause WITH f ORDER BY f.$order_key $order_dir SKIP $start LIMIT $length RETURN collect([f.vuln_id, f.artifact, f.entity_label, f.entity]) AS rows } RETURN total, filtered, rows"
+FILTERED_COUNT_CLAUSE = "CALL { MATCH (f:Finding) WHERE $where_clause RETURN count(f) AS filtered }"
+UNFILTERED_COUNT_CLAUSE = "WITH total, total AS filtered"
+TECHNOLOGY_FILTER = " AND f.entity_label = $technology"
+SEARCH_FILTER = " AND (toLower(f.vuln_id) CONTAINS $search OR toLower(f.artifact) CONTAINS $search OR toLower(f.entity) CONTAINS $search)"
+ORDER_KEYS = {0: "vuln_id", 2: "entity_label", 3: "entity"} # DataTables column -> indexed Finding property
+MAX_PAGE_LENGTH = 1000
+FINDINGS_HEADERS = ["VulnID", "Description", "Technology", "Artifacts","Further Read"]
+
+# only what the published scan generations saw is shown (Scan_Counter.live), nodes from before generations existed always are
+VISIBLE_FILTER = "($var.generations IS NULL OR any(gen IN $var.generations WHERE gen IN $live))"
+
+# graph pages: the nodes of the selected labels in id order, each with its outgoing relationships.
+# Labels can't be query parameters, they are only ever taken from GRAPH_LABELS
+GRAPH_QUERY = "CALL { $label_scans } WITH n ORDER BY id(n) LIMIT $limit OPTIONAL MATCH (n)-[r]->(m) WHERE $visible_r AND $visible_m RETURN id(n), labels(n), properties(n), collect(CASE WHEN r IS NULL THEN NULL ELSE [id(r), type(r), id(m), labels(m)[0]] END)"
+GRAPH_LABEL_SCAN = "MATCH (n:$label) WHERE id(n) > $after AND $visible_n$hidden WITH n ORDER BY id(n) LIMIT $limit RETURN n"
+GRAPH_HIDDEN_FILTER = " AND NOT exists { MATCH $pattern }"
+GRAPH_LABELS = [
+	"Jenkins_Server", "Jenkins_Node", "Jenkins_Job", "Jenkins_Build", "Jenkins_User", "Jenkins_Plugin",
+	"Github_Organization", "Github_Repository", "Github_Team", "Github_User",
+	"Action_Workflow", "Action_Job", "Action_Runner", "Action_Step", "Action_Action", "Action_Command",
+	"JFrog_Server", "JFrog_Permission", "JFrog_Group", "JFrog_User",
+	"Finding",
+]
+GRAPH_PAGE_SIZE = 2000
+MAX_GRAPH_PAGE_SIZE = 10000
+
+# level of detail: members are collapsed into one Summary node per parent and expanded on demand through graph/expand.
+# In each pattern p is the parent and $member the collapsed node, "inbound" when the relationship points at the parent
+GRAPH_AGGREGATES = {
+	"builds": {"parent": "Jenkins_Job", "relation": "BUILD", "inbound": False, "members": {
+		"Jenkins_Build": "(p:Jenkins_Job)-[:BUILD]->($member:Jenkins_Build)",
+	}},
+	"steps": {"parent": "Action_Job", "relation": "EXECUTES", "inbound": True, "members": {
+		"Action_Step": "($member:Action_Step)-[:EXECUTES]->(p:Action_Job)",
+		"Action_Command": "($member:Action_Command)-[:RUNS]->(:Action_Step)-[:EXECUTES]->(p:Action_Job)",
+	}},
+	"team_members": {"parent": "Github_Team", "relation": "MEMBER", "inbound": False, "members": {
+		"Github_User": "(p:Github_Team)-[:MEMBER]->($member:Github_User)",
+	}},
+	"group_members": {"parent": "JFrog_Group", "relation": "PART_OF", "inbound": False, "members": {
+		"JFrog_User": "(p:JFrog_Group)-[:PART_OF]->($member:JFrog_User)",
+	}},
+}
+# per parent: member count, mean stored position and the findings on the members or on their neighbours other than the parent
+SUMMARY_QUERY = "MATCH $pattern WHERE id(p) IN $parents AND $visible_m WITH DISTINCT p, m OPTIONAL MATCH (m)-[*0..1]-(x)-[:AFFECTED_BY]->(f:Finding) WHERE x <> p AND $visible_f WITH p, m, collect(DISTINCT f.vuln_id) AS vulns RETURN id(p), count(m), avg(m.layout_x), avg(m.layout_y), collect(vulns)"
+MEMBER_PARENTS_QUERY = "MATCH $pattern WHERE id(m) IN $members RETURN DISTINCT id(m), id(p)"
+EXPAND_QUERY = "CALL { $member_scans } WITH m ORDER BY id(m) LIMIT $limit OPTIONAL MATCH (m)-[r]-(o) WHERE $visible_r AND $visible_o RETURN id(m), labels(m), properties(m), collect(CASE WHEN r IS NULL THEN NULL ELSE [id(r), type(r), id(startNode(r)), id(endNode(r))] END)"
+EXPAND_MEMBER_SCAN = "MATCH $pattern WHERE id(p) = $parent AND id(m) > $after AND $visible_m WITH DISTINCT m ORDER BY id(m) LIMIT $limit RETURN m"
+SUMMARY_ID_PATTERN = re.compile(r"^summary:(\w+):(\d+)$")
+FINDING_SEVERITY = {
+	"SIA002": 4, "SIA004": 4,
+	"JFA002": 3, "JNK002": 3, "JNK010": 3,
+	"SIA005": 2, "SIA011": 2, "SIA015": 2, "SIA016": 2, "JNK003": 2, "JFA001": 2,
+	"SIA003": 1, "GHA001": 1,
+}
+SEVERITY_NAMES = {4: "critical", 3: "high", 2: "medium", 1: "low"}
+TECHNOLOGIES = {
+	"Action_Action": "Github Action",
+	"Action_Workflow": "Github Action Workflow",
+	"Github_Organization": "Github Organization",
+	"Github_Repository": "Github Repository",
+	"Jenkins_Server": "Jenkins Server",
+	"Jenkins_Plugin": "Jenkins Plugin",
+	"JFrog_Server": "JFrog Server",
+}
+
 
 def index(request):
 	
@@ -90,210 +165,265 @@ def actionreview(request):
 
 
 def  vulnerabilities(request):
+	# rows are loaded page by page from vulnerabilities_data()
 
-	data = []
-	headers = ["VulnID", "Description", "Technology", "Artifacts","Further Read"]
-
-	for action in Action_Action.nodes:
-		
-		if action.affected_vulns != "":
-			vulns = str(action.affected_vulns).split("$")
-			artifacts = str(action.vuln_artifacts).split("$")
-
-			for i in range(1,len(vulns)):
-				row = []
-				if vulns != "":
-					row.append(vulns[i])
-					row.append("")
-					row.append("Github Action")
-					row.append(artifacts[i] + " " + str(action.name))
-					row.append("")
-					data.append(row)
-
-	for workflow in Action_Workflow.nodes:	
-		if workflow.affected_vulns != "":
-			vulns = str(workflow.affected_vulns).split("$")
-			artifacts = str(workflow.vuln_artifacts).split("$")
-
-			for i in range(1,len(vulns)):
-				row = []
-				if vulns != "":
-					row.append(vulns[i])
-					row.append("")
-					row.append("Github Action Workflow")
-					row.append(artifacts[i] + " " + str(workflow.name))
-					row.append("")
-					data.append(row)
-
-	for organization in Github_Organization.nodes:	
-		if organization.affected_vulns != "":
-			vulns = str(organization.affected_vulns).split("$")
-			artifacts = str(organization.vuln_artifacts).split("$")
-
-			for i in range(1,len(vulns)):
-				row = []
-				if vulns != "":
-					row.append(vulns[i])
-					row.append("")
-					row.append("Github Organization")
-					row.append(artifacts[i] + " " + str(organization.name))
-					row.append("")
-					data.append(row)
-
-	for repository in Github_Repository.nodes:	
-		if repository.affected_vulns != "":
-			vulns = str(repository.affected_vulns).split("$")
-			artifacts = str(repository.vuln_artifacts).split("$")
-
-			for i in range(1,len(vulns)):
-				row = []
-				if vulns != "":
-					row.append(vulns[i])
-					row.append("")
-					row.append("Github Repository")
-					row.append(artifacts[i] + " " + str(repository.name))
-					row.append("")
-					data.append(row)	
-
-	for server in Jenkins_Server.nodes:	
-		if server.affected_vulns != "":
-			vulns = str(server.affected_vulns).split("$")
-			artifacts = str(server.vuln_artifacts).split("$")
-
-			for i in range(1,len(vulns)):
-				row = []
-				if vulns != "":
-					row.append(vulns[i])
-					row.append("")
-					row.append("Jenkins Server")
-					row.append(artifacts[i] + " " + str(server.url))
-					row.append("")
-					data.append(row)	
-	
-
-
-
-	#################################
-
-	# for workflow in workflows:
-	# 	result = {}
-	# 	result['repo'] = repo.name
-	# 	result['workflow'] = workflow.name
-		
-	# 	workflow_data = parse_workflow(workflow)
-	# 	result["repo"] = repo.name
-	# 	result["workflow"] = workflow.name
-		
-		
-	# 	issues = []
-	# 	issue = {}
-		
-	# 	# SIA004
-	# 	issue["issue_id"] = "SIA004"
-	# 	issue["status"] = "Not Applicable"
-	# 	if ((not repo.private) and any_self_hosted(workflow_data)):
-	# 		issue["status"] = "Vulnerable"
-	# 	elif not repo.private:
-	# 		issue["status"] = "Not Vulnerable"
-
-	# 	issues.append(issue)
-	# 	issue = {}
-
-	# 	# SIA003	
-	# 	issue["issue_id"] = "SIA003"
-	# 	issue["status"] = "Not Applicable"
-	# 	if (repo.private) and (not all_self_hosted(workflow_data)):
-	# 		issue["status"] = "Vulnerable"
-	# 	elif repo.private:
-	# 		issue["status"] = "Not Vulnerable"
-	# 	issues.append(issue)
-		
-
-	# 	# SIA002
-	# 	issue["issue_id"] = "SIA002"
-	# 	issue["status"] = "Not Applicable"
-
-	# 	issue = {}
-	# 	matches = find_insecure_inputs(workflow_data)
-	# 	if len(matches) > 0:
-	# 		issue["issue_id"] = "SIA002"
-	# 		issue["status"] = "Vulnerable"
-	# 		issue["config"] = matches 
-	# 		issues.append(issue)
-
-	# 	# SIA005
-
-	# 	issue = {}
-	# 	actions = find_actions(workflow_data)
-	# 	for action in actions:
-	# 		if len(action.split("@")) < 2:
-	# 			issue["issue_id"] = "SIA005"
-	# 			issue["status"] = "Vulnerable"
-	# 			issue["config"] = action
-	# 			issues.append(issue)
-	# 		elif "master" in action.split("@")[1]:
-	# 			issue["issue_id"] = "SIA005"
-	# 			issue["status"] = "Vulnerable"
-	# 			issue["config"] = action
-	# 			issues.append(issue)
-
-	# 	# SIA011
-	# 	# Note - it requires "administration" permission 
-	# 	# PyGithub library doesn't support it
-
-	# 	issue = {}
-	# 	workflow_permission = requests.get('https://api.github.com' + WORKFLOW_PERMISSIONS_QUERY.replace("$owner_name",str(organization_name)).replace("$repo_name",str(repo.name)), headers={'Authorization': 'bearer ' + str(os.getenv("GITHUB_ACCESS_TOKEN")) ,'Accept': 'application/vnd.github.vixen-preview+json'}).json()
-	# 	if "can_approve_pull_request_reviews" in workflow_permission:
-	# 		if workflow_permission["can_approve_pull_request_reviews"]:
-	# 			issue["issue_id"] = "SIA011"
-	# 			issue["status"] = "Vulnerable"
-	# 			issue["config"] = workflow_permission
-	# 			issues.append(issue)
-
-	# 	# SIA016
-	# 	# Note - it requires "administration" permission 
-	# 	# PyGithub library doesn't support it
-
-	# 	issue = {}
-	# 	if "write" in workflow_permission["default_workflow_permissions"]:
-	# 		issue["issue_id"] = "SIA016"
-	# 		issue["status"] = "Vulnerable"
-	# 		issue["config"] = workflow_permission
-	# 		issues.append(issue)
-
-	# 	# SIA015
-	# 	# Note - it requires "administration" permission 
-	# 	# PyGithub library doesn't support it
-		
-	# 	issue = {}
-	# 	action_permission = requests.get('https://api.github.com' + ACTION_PERMISSIONS_QUERY.replace("$owner_name",str(organization_name)).replace("$repo_name",str(repo.name)), headers={'Authorization': 'bearer ' + str(os.getenv("GITHUB_ACCESS_TOKEN")) ,'Accept': 'application/vnd.github.vixen-preview+json'}).json()
-	# 	if "all" in action_permission["allowed_actions"]:
-	# 		issue["issue_id"] = "SIA015"
-	# 		issue["status"] = "Vulnerable"
-	# 		issue["config"] = action_permission
-	# 		issues.append(issue)
-	# 	elif "selected" in action_permission["allowed_actions"]:
-	# 		selected_actions = requests.get(action_permission["selected_actions_url"], headers={'Authorization': 'bearer ' + str(os.getenv("GITHUB_ACCESS_TOKEN")) ,'Accept': 'application/vnd.github.vixen-preview+json'}).json()
-	# 		issue["issue_id"] = "SIA015"
-	# 		issue["status"] = "Review"
-	# 		issue["config"] = selected_actions
-	# 		issues.append(issue)
-
-	# 	result["issues"] = issues
-	# 	OUTPUT.append(result)
-
-
-
-
-
-	#################################
-
-
-	# data = []
-	
-
+	technologies = sorted(TECHNOLOGIES.items(), key=lambda item: item[1])
 	context = {
-		"headers": headers,
-		"data": data
+		"headers": FINDINGS_HEADERS,
+		"technologies": technologies
 	}
-	return render(request,"vulnerabilities.html",context)
\ No newline at end of file
+	return render(request,"vulnerabilities.html",context)
+
+
+def vulnerabilities_data(request):
+	# DataTables server-side processing: https://datatables.net/manual/server-side
+	try:
+		draw = int(request.GET.get("draw", 0))
+		start = max(int(request.GET.get("start", 0)), 0)
+		length = int(request.GET.get("length", 10))
+		order_column = int(request.GET.get("order[0][column]", 0))
+	except ValueError:
+		return JsonResponse({"error": "invalid paging parameters"}, status=400)
+	if length < 0 or length > MAX_PAGE_LENGTH:
+		length = MAX_PAGE_LENGTH
+	order_key = ORDER_KEYS.get(order_column, "vuln_id")
+	order_dir = "DESC" if request.GET.get("order[0][dir]") == "desc" else "ASC"
+
+	params = {"start": start, "length": length, "live": query_cache.live_generations()}
+	where_clause = "f." + order_key + " IS NOT NULL AND " + visible("f")
+	technology = request.GET.get("technology", "")
+	if technology in TECHNOLOGIES:
+		where_clause += TECHNOLOGY_FILTER
+		params["technology"] = technology
+	search = request.GET.get("search[value]", "").strip().lower()
+	if search:
+		where_clause += SEARCH_FILTER
+		params["search"] = search
+
+	count_clause = UNFILTERED_COUNT_CLAUSE
+	if "technology" in params or "search" in params:
+		count_clause = FILTERED_COUNT_CLAUSE
+	query = FINDINGS_PAGE_QUERY.replace("$filtered_clause", count_clause).replace("$where_clause", where_clause).replace("$order_key", order_key).replace("$order_dir", order_dir)
+	total, filtered, rows = query_cache.cached_query("findings", {"query": query, "params": params}, lambda: db.cypher_query(query, params)[0][0])
+
+	data = []
+	for vuln_id, artifact, entity_label, entity in rows:
+		row = []
+		row.append(escape(vuln_id))
+		row.append("")
+		row.append(escape(TECHNOLOGIES.get(entity_label, str(entity_label).replace("_", " "))))
+		row.append(escape(str(artifact) + " " + str(entity)))
+		row.append("")
+		data.append(row)
+
+	return JsonResponse({
+		"draw": draw,
+		"recordsTotal": total,
+		"recordsFiltered": filtered,
+		"data": data
+	})
+
+
+def visible(var):
+	return VISIBLE_FILTER.replace("$var", var)
+
+def with_visibility(query):
+	# fills in the $visible_<variable> placeholders of a graph query
+	for var in ["n", "m", "o", "r", "f"]:
+		query = query.replace("$visible_" + var, visible(var))
+	return query
+
+def paging(request):
+	# continuation token and page size shared by graph and graph/expand, raises ValueError
+	after = int(request.GET.get("after", -1))
+	limit = int(request.GET.get("limit", GRAPH_PAGE_SIZE))
+	return after, min(max(limit, 1), MAX_GRAPH_PAGE_SIZE)
+
+
+@gzip_page
+def graph(request):
+	"""
+	Nodes and relationships of the selected labels (?labels=Jenkins_Job&labels=...,
+	default all of GRAPH_LABELS) in the node/relationship shape of Neo4j's
+	graph results. At most `limit` nodes per response, "next" is the
+	continuation token for the following page and null on the last one.
+
+	Builds, workflow steps and commands, and team or group members are
+	collapsed into Summary nodes next to their parent unless ?detail=full.
+	"""
+	labels = request.GET.getlist("labels") or GRAPH_LABELS
+	for label in labels:
+		if label not in GRAPH_LABELS:
+			return JsonResponse({"error": "unknown label " + label}, status=400)
+	try:
+		after, limit = paging(request)
+	except ValueError:
+		return JsonResponse({"error": "invalid continuation token or limit"}, status=400)
+	aggregate = request.GET.get("detail", "summary") != "full"
+
+	labels = sorted(set(labels))
+	page = query_cache.cached_query("graph", {"labels": labels, "after": after, "limit": limit, "aggregate": aggregate}, lambda: graph_page(labels, after, limit, aggregate))
+	return JsonResponse(page)
+
+
+@gzip_page
+def graph_expand(request):
+	"""
+	Members of one Summary node (?node=summary:<aggregate>:<parent id>) with
+	every relationship they take part in, paged like graph.
+	"""
+	match = SUMMARY_ID_PATTERN.match(request.GET.get("node", ""))
+	if not match or match.group(1) not in GRAPH_AGGREGATES:
+		return JsonResponse({"error": "unknown summary node"}, status=400)
+	try:
+		after, limit = paging(request)
+	except ValueError:
+		return JsonResponse({"error": "invalid continuation token or limit"}, status=400)
+
+	name, parent = match.group(1), int(match.group(2))
+	page = query_cache.cached_query("graph_expand", {"name": name, "parent": parent, "after": after, "limit": limit}, lambda: expand_page(name, parent, after, limit))
+	return JsonResponse(page)
+
+
+def summary_id(name, parent_id):
+	return "summary:" + name + ":" + str(parent_id)
+
+def summary_edge(start, rel_type, end):
+	# synthetic relationships get ids from their ends, so the same one from two pages is only drawn once
+	return {"id": "summary:" + str(start) + ":" + rel_type + ":" + str(end), "type": rel_type, "startNode": str(start), "endNode": str(end), "properties": {}}
+
+def graph_page(labels, after, limit, aggregate=True):
+	# only members of selected labels are collapsed, and only under a parent of a selected label
+	aggregates = {}
+	for name in GRAPH_AGGREGATES:
+		members = {label: pattern for label, pattern in GRAPH_AGGREGATES[name]["members"].items() if label in labels}
+		if aggregate and members and GRAPH_AGGREGATES[name]["parent"] in labels:
+			aggregates[name] = dict(GRAPH_AGGREGATES[name], members=members)
+
+	# members with a parent on the graph are left out of the scans, the parent's page carries their summary
+	label_scans = []
+	for label in labels:
+		hidden = ""
+		for name in aggregates:
+			if label in aggregates[name]["members"]:
+				hidden += GRAPH_HIDDEN_FILTER.replace("$pattern", aggregates[name]["members"][label].replace("$member", "n"))
+		label_scans.append(GRAPH_LABEL_SCAN.replace("$label", label).replace("$hidden", hidden))
+	results, columns = db.cypher_query(with_visibility(GRAPH_QUERY.replace("$label_scans", " UNION ".join(label_scans))), {"after": after, "limit": limit, "live": query_cache.live_generations()})
+
+	nodes = []
+	edges = []
+	for node_id, node_labels, properties, node_edges in results:
+		nodes.append({"id": str(node_id), "labels": node_labels, "properties": properties})
+		edges.extend([[node_id] + edge for edge in node_edges if edge is not None])
+
+	summaries = {}
+	if aggregates:
+		summaries = summarise(aggregates, [[row[0], row[1]] for row in results])
+	relationships = {}
+	for summary in summaries.values():
+		nodes.append(summary["node"])
+		relationships[summary["edge"]["id"]] = summary["edge"]
+
+	# relationships to collapsed members are drawn to the members' summaries instead
+	collapsed = collapsed_members(aggregates, edges)
+	for start, rel_id, rel_type, end, end_label in edges:
+		if end in collapsed:
+			for target in collapsed[end]:
+				edge = summary_edge(start, rel_type, target)
+				relationships[edge["id"]] = edge
+		else:
+			relationships[str(rel_id)] = {"id": str(rel_id), "type": rel_type, "startNode": str(start), "endNode": str(end), "properties": {}}
+
+	next_token = None
+	if len(results) == limit:
+		next_token = str(max([row[0] for row in results])) # aggregation doesn't keep the id order
+	return {"nodes": nodes, "relationships": list(relationships.values()), "next": next_token}
+
+def summarise(aggregates, page_nodes):
+	# one Summary node per parent on this page and aggregate with at least one member
+	summaries = {}
+	for name in aggregates:
+		parents = [node_id for node_id, node_labels in page_nodes if aggregates[name]["parent"] in node_labels]
+		if not parents:
+			continue
+		for member_label in aggregates[name]["members"]:
+			pattern = aggregates[name]["members"][member_label].replace("$member", "m")
+			results, columns = db.cypher_query(with_visibility(SUMMARY_QUERY.replace("$pattern", pattern)), {"parents": parents, "live": query_cache.live_generations()})
+			for parent_id, members, layout_x, layout_y, vulns in results:
+				summary = summaries.setdefault(summary_id(name, parent_id), {"name": name, "parent": parent_id, "counts": {}, "placed": 0, "x": 0.0, "y": 0.0, "vulns": set()})
+				summary["counts"][member_label] = members
+				if layout_x is not None and layout_y is not None:
+					summary["placed"] += members
+					summary["x"] += layout_x * members
+					summary["y"] += layout_y * members
+				for member_vulns in vulns:
+					summary["vulns"].update(member_vulns)
+
+	for node_id in summaries:
+		summaries[node_id] = summary_node(node_id, aggregates[summaries[node_id]["name"]], summaries[node_id])
+	return summaries
+
+def summary_node(node_id, aggregate, summary):
+	properties = {}
+	properties["aggregate"] = summary["name"]
+	properties["parent"] = str(summary["parent"])
+	properties["total"] = sum(summary["counts"].values())
+	properties["name"] = ", ".join([str(summary["counts"][label]) + " " + label for label in summary["counts"]])
+	properties["counts"] = summary["counts"]
+	properties["findings"] = len(summary["vulns"])
+	if summary["vulns"]:
+		worst = max(summary["vulns"], key=lambda vuln_id: (FINDING_SEVERITY.get(vuln_id, 1), vuln_id))
+		properties["worst_vuln"] = worst
+		properties["worst_severity"] = SEVERITY_NAMES[FINDING_SEVERITY.get(worst, 1)]
+	if summary["placed"]:
+		properties["layout_x"] = summary["x"] / summary["placed"]
+		properties["layout_y"] = summary["y"] / summary["placed"]
+
+	if aggregate["inbound"]:
+		edge = summary_edge(node_id, aggregate["relation"], summary["parent"])
+	else:
+		edge = summary_edge(summary["parent"], aggregate["relation"], node_id)
+	return {"node": {"id": node_id, "labels": ["Summary"], "properties": properties}, "edge": edge}
+
+def collapsed_members(aggregates, edges):
+	# member id -> ids of the summaries it is collapsed into, for the members these relationships end at
+	collapsed = {}
+	for name in aggregates:
+		for member_label in aggregates[name]["members"]:
+			members = list(set([edge[3] for edge in edges if edge[4] == member_label]))
+			if not members:
+				continue
+			pattern = aggregates[name]["members"][member_label].replace("$member", "m")
+			results, columns = db.cypher_query(MEMBER_PARENTS_QUERY.replace("$pattern", pattern), {"members": members})
+			for member_id, parent_id in results:
+				collapsed.setdefault(member_id, []).append(summary_id(name, parent_id))
+	return collapsed
+
+def expand_page(name, parent, after, limit):
+	member_scans = " UNION ".join([EXPAND_MEMBER_SCAN.replace("$pattern", pattern.replace("$member", "m")) for pattern in GRAPH_AGGREGATES[name]["members"].values()])
+	results, columns = db.cypher_query(with_visibility(EXPAND_QUERY.replace("$member_scans", member_scans)), {"parent": parent, "after": after, "limit": limit, "live": query_cache.live_generations()})
+
+	nodes = []
+	relationships = {}
+	for node_id, node_labels, properties, edges in results:
+		nodes.append({"id": str(node_id), "labels": node_labels, "properties": properties})
+		for edge in edges:
+			if edge is not None:
+				relationships[str(edge[0])] = {"id": str(edge[0]), "type": edge[1], "startNode": str(edge[2]), "endNode": str(edge[3]), "properties": {}}
+
+	next_token = None
+	if len(results) == limit:
+		next_token = str(max([row[0] for row in results]))
+	return {"nodes": nodes, "relationships": list(relationships.values()), "next": next_token}
+
+
+def cache_stats(request):
+	return JsonResponse(query_cache.stats())
+
+
+@require_POST # CSRF protected and staff only, scripts run `manage.py purge_cache` instead
+def cache_purge(request):
+	if not request.user.is_staff:
+		return JsonResponse({"error": "staff only"}, status=403)
+	query_cache.purge()
+	return JsonResponse(query_cache.stats())
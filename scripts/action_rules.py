@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+
+import functools
+import re
+
+# Global Variables
+INSECURE_INPUT_PATTERN = re.compile(r'\${{[\w. ]*}}')
+CODEOWNERS_PATHS = [".github/CODEOWNERS", "CODEOWNERS", "docs/CODEOWNERS"]
+UNPINNED_CACHE_SIZE = 4096
+
+RULES = [] # (vuln_id, rule) in evaluation order, see register()
+
+# Workflow rules only look at the parsed workflow file, so the same code runs
+# against the GitHub API in github_action_scanner.py and against local
+# checkouts, mirrors and archives in offline_action_scanner.py.
+
+
+def register(vuln_id):
+	"""
+	Adds a workflow rule. A rule is called as rule(workflow, private) with the
+	WorkflowFacts collected in the single walk over the workflow, and returns
+	the list of its findings - every match, not only the first one.
+	"""
+	def decorator(rule):
+		RULES.append((vuln_id, rule))
+		return rule
+	return decorator
+
+
+class WorkflowFacts(object):
+	# everything the rules look at, gathered in one pass over jobs and steps
+
+	def __init__(self, workflow_name, jobs):
+		self.name = workflow_name
+		self.runners = [] # (job id, runs-on as text)
+		self.commands = [] # run scripts, in document order
+		self.actions = [] # step uses, and job uses for reusable workflows
+		# bound once, this loop runs for every step of every workflow
+		add_runner = self.runners.append
+		add_command = self.commands.append
+		add_action = self.actions.append
+		for job_id, job in jobs.items():
+			if type(job) is not dict:
+				continue
+			runs_on = job.get("runs-on")
+			if runs_on is not None:
+				add_runner((job_id, runs_on if type(runs_on) is str else str(runs_on)))
+			uses = job.get("uses")
+			if uses is not None:
+				add_action(uses if type(uses) is str else str(uses))
+			steps = job.get("steps")
+			if type(steps) is not list:
+				continue
+			for step in steps:
+				if type(step) is not dict:
+					continue
+				if "run" in step:
+					run = step["run"]
+					add_command(run if type(run) is str else str(run))
+				if "uses" in step:
+					uses = step["uses"]
+					add_action(uses if type(uses) is str else str(uses))
+
+
+def finding(vuln_id,impacted_area):
+	vuln_data = {}
+	vuln_data["vuln_id"] = vuln_id
+	vuln_data["impacted_area"] = impacted_area
+	return vuln_data
+
+@functools.lru_cache(maxsize=UNPINNED_CACHE_SIZE)
+def is_unpinned(action):
+	# no ref at all, or a ref that follows the default branch. Local actions (./path) come from the same commit.
+	# Cached: the same few actions are used across most workflows of an organization
+	if action.startswith("./"):
+		return False
+	name, separator, ref = action.partition("@")
+	if not separator:
+		return True
+	return "master" in ref
+
+
+@register("SIA004")
+def self_hosted_on_public(workflow,private):
+	# public repository with jobs on self-hosted runners
+	if private is not False:
+		return []
+	jobs = [job_id for job_id, runs_on in workflow.runners if "self-hosted" in runs_on]
+	if jobs:
+		return [finding("SIA004",str(workflow.name) + " any self-hosted " + str(jobs))]
+	return []
+
+@register("SIA003")
+def hosted_on_private(workflow,private):
+	# private repository with jobs that aren't on self-hosted runners
+	if private is not True:
+		return []
+	jobs = [job_id for job_id, runs_on in workflow.runners if "self-hosted" not in runs_on]
+	if jobs:
+		return [finding("SIA003",str(workflow.name) + " all self-hosted " + str(jobs))]
+	return []
+
+@register("SIA002")
+def insecure_inputs(workflow,private):
+	# expressions interpolated straight into run scripts. The pattern can't span lines, so all scripts are searched in one call
+	commands = "\n".join(workflow.commands)
+	if "${{" not in commands:
+		return []
+	matches = INSECURE_INPUT_PATTERN.findall(commands)
+	if matches:
+		return [finding("SIA002",matches)]
+	return []
+
+@register("SIA005")
+def unpinned_actions(workflow,private):
+	# actions and reusable workflows used without a ref or from master
+	findings = []
+	for action in workflow.actions:
+		if is_unpinned(action):
+			vuln_data = finding("SIA005",action)
+			vuln_data["action"] = action
+			findings.append(vuln_data)
+	return findings
+
+
+def evaluate_workflow(workflow_name,workflow_data,private=None):
+	"""
+	Walks the workflow once and evaluates every registered rule on what was
+	collected, returns (findings, errors). private is the repository
+	visibility, None when it isn't known, in which case the visibility
+	dependent SIA003/SIA004 don't report anything.
+	"""
+	findings = []
+	errors = []
+	jobs = workflow_data.get("jobs") if isinstance(workflow_data, dict) else None
+	if not isinstance(jobs, dict):
+		errors.append("no jobs defined")
+		return findings, errors
+
+	workflow = WorkflowFacts(workflow_name, jobs)
+	for vuln_id, rule in RULES:
+		try:
+			findings.extend(rule(workflow,private))
+		except Exception as ex:
+			errors.append(vuln_id + ": " + repr(ex))
+	for vuln_data in findings:
+		vuln_data["workflow"] = workflow_name
+	return findings, errors
+
+def evaluate_codeowners(repository,codeowners_paths):
+	# GHA001, codeowners_paths are the CODEOWNERS_PATHS present in the repository
+	if len(codeowners_paths) > 0:
+		return []
+	return [finding("GHA001",str(repository) + " no CODEOWNERS file defined")]
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+
+import argparse
+import re
+import time
+import yaml
+from action_rules import INSECURE_INPUT_PATTERN, evaluate_workflow, finding
+from offline_action_scanner import READERS, discover_sources
+
+# Global Variables
+DEFAULT_REPEAT = 20
+
+# Micro-benchmark of the single-pass rule engine in action_rules.py against
+# the per-rule walkers github_action_scanner.py used before it - as they were,
+# stopping at the first match, and completed to report every match - over a
+# corpus of workflows read the same way offline_action_scanner.py reads them.
+# Every evaluator returns the same finding records, and the completed walkers
+# must report exactly the engine's findings before anything is timed.
+# Parsing is done once up front, only rule evaluation is timed.
+
+
+def legacy_any_self_hosted(workflow_data):
+	for job in workflow_data['jobs']:
+		return "self-hosted" in workflow_data['jobs'][job]['runs-on']
+	return False
+
+def legacy_all_self_hosted(workflow_data):
+	all_self_hosted = True
+	for job in workflow_data['jobs']:
+		if "self-hosted" not in workflow_data['jobs'][job]['runs-on']:
+			all_self_hosted = False
+			return all_self_hosted
+	return all_self_hosted
+
+def legacy_find_insecure_inputs(workflow_data):
+	for job in workflow_data['jobs']:
+		for step in workflow_data['jobs'][job]['steps']:
+			if "run" in step:
+				matches = re.findall('\\${{[\\w. ]*}}',step['run'])
+				return matches
+	return []
+
+def legacy_find_actions(workflow_data):
+	actions = []
+	for job in workflow_data['jobs']:
+		for step in workflow_data['jobs'][job]['steps']:
+			if "uses" in step:
+				actions.append(step['uses'])
+	return actions
+
+def legacy_evaluate(workflow_name,workflow_data,private):
+	# the old walkers, first match only, reported as the same finding records the engine returns
+	findings = []
+	for rule in [legacy_any_self_hosted, legacy_all_self_hosted, legacy_find_insecure_inputs, legacy_find_actions]:
+		try:
+			result = rule(workflow_data)
+		except Exception:
+			continue
+		if rule is legacy_any_self_hosted:
+			if private is False and result:
+				findings.append(finding("SIA004",str(workflow_name) + " any self-hosted"))
+		elif rule is legacy_all_self_hosted:
+			if private is True and not result:
+				findings.append(finding("SIA003",str(workflow_name) + " all self-hosted"))
+		elif rule is legacy_find_insecure_inputs:
+			if len(result) > 0:
+				findings.append(finding("SIA002",result))
+		else:
+			for action in result:
+				if len(action.split("@")) < 2 or "master" in action.split("@")[1]:
+					vuln_data = finding("SIA005",action)
+					vuln_data["action"] = action
+					findings.append(vuln_data)
+	for vuln_data in findings:
+		vuln_data["workflow"] = workflow_name
+	return findings
+
+def complete_evaluate(workflow_name,workflow_data,private):
+	# the legacy approach fixed to report every match: each rule still walks jobs and steps on its own.
+	# Same findings, in the same order, as evaluate_workflow()
+	findings = []
+	jobs = workflow_data.get("jobs")
+	if not isinstance(jobs, dict):
+		return findings
+	jobs = {job_id: job for job_id, job in jobs.items() if isinstance(job, dict)}
+
+	def job_steps(job):
+		steps = job.get("steps")
+		return [step for step in steps if isinstance(step, dict)] if isinstance(steps, list) else []
+
+	if private is False:
+		self_hosted = [job for job in jobs if "runs-on" in jobs[job] and "self-hosted" in str(jobs[job]["runs-on"])]
+		if self_hosted:
+			findings.append(finding("SIA004",str(workflow_name) + " any self-hosted " + str(self_hosted)))
+	if private is True:
+		hosted = [job for job in jobs if "runs-on" in jobs[job] and "self-hosted" not in str(jobs[job]["runs-on"])]
+		if hosted:
+			findings.append(finding("SIA003",str(workflow_name) + " all self-hosted " + str(hosted)))
+
+	matches = []
+	for job in jobs:
+		for step in job_steps(jobs[job]):
+			if "run" in step:
+				matches.extend(INSECURE_INPUT_PATTERN.findall(str(step["run"])))
+	if matches:
+		findings.append(finding("SIA002",matches))
+
+	for job in jobs:
+		uses = [jobs[job]["uses"]] if "uses" in jobs[job] else [] # reusable workflow called by the job
+		uses += [step["uses"] for step in job_steps(jobs[job]) if "uses" in step]
+		for action in [str(action) for action in uses]:
+			if not action.startswith("./") and (len(action.split("@")) < 2 or "master" in action.split("@")[1]):
+				vuln_data = finding("SIA005",action)
+				vuln_data["action"] = action
+				findings.append(vuln_data)
+
+	for vuln_data in findings:
+		vuln_data["workflow"] = workflow_name
+	return findings
+
+def engine_evaluate(workflow_name,workflow_data,private):
+	findings, errors = evaluate_workflow(workflow_name,workflow_data,private)
+	return findings
+
+def compare(corpus,private):
+	# workflows where the per-rule walkers and the engine disagree, the timings only mean something without any
+	return [workflow_name for workflow_name, workflow_data in corpus if complete_evaluate(workflow_name,workflow_data,private) != engine_evaluate(workflow_name,workflow_data,private)]
+
+
+def load_corpus(paths):
+	corpus = []
+	for root in paths:
+		for kind, path in discover_sources(root):
+			for repository, workflows, codeowners in READERS[kind](path):
+				for workflow_path in sorted(workflows):
+					try:
+						workflow_data = yaml.safe_load(workflows[workflow_path])
+					except yaml.YAMLError:
+						continue
+					if isinstance(workflow_data, dict):
+						corpus.append((workflow_data.get("name") or workflow_path, workflow_data))
+	return corpus
+
+def bench(evaluate,corpus,private,repeat):
+	best = None
+	findings = 0
+	for _ in range(repeat):
+		started = time.perf_counter()
+		findings = 0
+		for workflow_name, workflow_data in corpus:
+			findings += len(evaluate(workflow_name,workflow_data,private))
+		elapsed = time.perf_counter() - started
+		best = elapsed if best is None else min(best, elapsed)
+	return best, findings
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("paths", nargs="+", help="Checkouts, bare git mirrors, tarballs or directories holding any of them")
+	parser.add_argument("--visibility", choices=["public", "private"], default="public", help="Repository visibility the rules are evaluated for (default public)")
+	parser.add_argument("-n","--repeat", type=int, default=DEFAULT_REPEAT, help="Passes over the corpus, the fastest one is reported (default " + str(DEFAULT_REPEAT) + ")")
+	args = parser.parse_args()
+
+	corpus = load_corpus(args.paths)
+	if not corpus:
+		print("[-] No workflows found")
+		exit(1)
+	private = args.visibility == "private"
+	print("[*] " + str(len(corpus)) + " workflows, best of " + str(args.repeat) + " passes")
+
+	mismatches = compare(corpus,private)
+	if mismatches:
+		print("[-] per-rule walkers and engine disagree on " + str(len(mismatches)) + " workflows, e.g. " + str(mismatches[0]))
+		exit(1)
+
+	results = {}
+	for label, evaluate in [("legacy", legacy_evaluate), ("per-rule", complete_evaluate), ("engine", engine_evaluate)]:
+		elapsed, findings = bench(evaluate,corpus,private,args.repeat)
+		results[label] = elapsed
+		print("[*] " + label + ": " + str(round(elapsed * 1000, 2)) + "ms per pass, " + str(round(elapsed / len(corpus) * 1000000, 1)) + "us per workflow, " + str(round(len(corpus) / elapsed)) + " workflows/s, " + str(findings) + " findings")
+	# legacy stops at the first match of each rule, per-rule and engine find the same matches
+	print("[*] engine vs per-rule walkers: " + str(round(results["per-rule"] / results["engine"], 2)) + "x, vs legacy first-match walkers: " + str(round(results["legacy"] / results["engine"], 2)) + "x")
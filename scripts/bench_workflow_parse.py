@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+import argparse
+import multiprocessing
+import time
+import yaml
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from offline_action_scanner import READERS, discover_sources
+
+# Global Variables
+DEFAULT_REPEAT = 5
+DEFAULT_WORKERS = 8
+
+# Benchmark of the two ways github_action_scanner.py can parse workflow YAML
+# while its repository workers run: in the worker threads themselves, or
+# handed from those threads to a spawn-started process pool one file at a
+# time (--processes). The corpus is read the same way offline_action_scanner.py
+# reads it and only parsing is timed, the pool's start-up included.
+
+
+def load_corpus(paths):
+	texts = []
+	for root in paths:
+		for kind, path in discover_sources(root):
+			for repository, workflows, codeowners in READERS[kind](path):
+				texts.extend([workflows[workflow_path] for workflow_path in sorted(workflows)])
+	return texts
+
+def safe_parse(text):
+	try:
+		return yaml.safe_load(text)
+	except yaml.YAMLError:
+		return None
+
+def parse_in_threads(texts,workers,processes):
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		return list(executor.map(safe_parse, texts))
+
+def parse_in_processes(texts,workers,processes):
+	# the scanner's threads each wait on their own submit(), as in parse_workflow()
+	with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			return list(executor.map(lambda text: pool.submit(safe_parse, text).result(), texts))
+
+def bench(parse,texts,workers,processes,repeat):
+	best = None
+	parsed = None
+	for _ in range(repeat):
+		started = time.perf_counter()
+		parsed = parse(texts,workers,processes)
+		elapsed = time.perf_counter() - started
+		best = elapsed if best is None else min(best, elapsed)
+	return best, parsed
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("paths", nargs="+", help="Checkouts, bare git mirrors, tarballs or directories holding any of them")
+	parser.add_argument("-w","--workers", type=int, default=DEFAULT_WORKERS, help="Scanning threads (default " + str(DEFAULT_WORKERS) + ")")
+	parser.add_argument("-p","--processes", type=int, default=multiprocessing.cpu_count(), help="Parsing processes (default: CPU count)")
+	parser.add_argument("-n","--repeat", type=int, default=DEFAULT_REPEAT, help="Passes over the corpus, the fastest one is reported (default " + str(DEFAULT_REPEAT) + ")")
+	args = parser.parse_args()
+
+	texts = load_corpus(args.paths)
+	if not texts:
+		print("[-] No workflows found")
+		exit(1)
+	print("[*] " + str(len(texts)) + " workflows (" + str(sum([len(text) for text in texts]) // 1024) + " KiB), " + str(args.workers) + " threads, " + str(args.processes) + " processes, best of " + str(args.repeat) + " passes")
+
+	thread_time, thread_parsed = bench(parse_in_threads,texts,args.workers,args.processes,args.repeat)
+	process_time, process_parsed = bench(parse_in_processes,texts,args.workers,args.processes,args.repeat)
+	if thread_parsed != process_parsed:
+		print("[-] threads and processes parsed the corpus differently")
+		exit(1)
+	print("    threads:   " + str(round(thread_time * 1000, 1)) + " ms")
+	print("    processes: " + str(round(process_time * 1000, 1)) + " ms (" + str(round(thread_time / process_time, 2)) + "x)")
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Global Variables
+CHECKPOINT_DIR = os.getenv("CICDGUARD_CHECKPOINT_DIR", os.path.join(os.path.expanduser("~"), ".cicdguard", "checkpoints"))
+
+
+class CheckpointStore(object):
+	"""
+	Last-seen build numbers and timestamps per job, one JSON file per
+	controller. Checkpoints are only written by save(), which the scanner
+	calls once the graph writes for the run have been flushed.
+	"""
+
+	def __init__(self, controller, directory=CHECKPOINT_DIR):
+		self.controller = controller
+		self.path = os.path.join(directory, hashlib.sha1(controller.encode()).hexdigest() + ".json")
+		self.lock = threading.Lock()
+		self.jobs = {}
+		if os.path.exists(self.path):
+			with open(self.path) as checkpoint_file:
+				self.jobs = json.load(checkpoint_file).get("jobs", {})
+
+	def get(self, job_name, build_type):
+		with self.lock:
+			return self.jobs.get(job_name, {}).get(build_type)
+
+	def update(self, job_name, build_type, number, timestamp):
+		with self.lock:
+			self.jobs.setdefault(job_name, {})[build_type] = {"number": number, "timestamp": timestamp}
+		return
+
+	def save(self):
+		with self.lock:
+			os.makedirs(os.path.dirname(self.path), exist_ok=True)
+			handle = tempfile.NamedTemporaryFile(mode="w", dir=os.path.dirname(self.path), suffix=".tmp", delete=False)
+			with handle:
+				json.dump({"controller": self.controller, "jobs": self.jobs}, handle, indent=1)
+			os.replace(handle.name, self.path)
+		return
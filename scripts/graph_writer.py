@@ -0,0 +1,302 @@
+#!/usr/bin/python3
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from neomodel import StructuredNode, UniqueIdProperty, db
+
+# Global Variables
+GRAPH_BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "500"))
+GENERATION_RETENTION = int(os.getenv("CICDGUARD_GENERATION_RETENTION", "50")) # latest scan generations, of all scanners together, that can still be diffed or published
+
+# every node, relationship and finding lists the scan generations it was seen in, nodes also a fingerprint of
+# their properties per generation, see scan_generations.py. Both lists only keep the live generations and those after
+# $floor (GENERATION_RETENTION back), so they stay bounded however often something is scanned
+RETAINED_GENERATION = "($entry IN $live OR $entry > $floor)"
+TAG_GENERATION = "$var.generations = [gen IN coalesce($var.generations, []) WHERE " + RETAINED_GENERATION.replace("$entry", "gen") + "] + CASE WHEN $gen IN coalesce($var.generations, []) THEN [] ELSE [$gen] END"
+TAG_FINGERPRINT = "$var.fingerprints = [i IN range(0, size(coalesce($var.generations, [])) - 1) WHERE " + RETAINED_GENERATION.replace("$entry", "$var.generations[i]") + " | coalesce($var.fingerprints[i], '')] + CASE WHEN $gen IN coalesce($var.generations, []) THEN [] ELSE [$fingerprint] END" # must come before TAG_GENERATION in a SET, it reads the generations before they are trimmed
+MERGE_NODES_QUERY = "UNWIND $rows AS row MERGE (n:$label {$key: row.value}) ON CREATE SET n.uid = row.uid SET n += row.props, n.last_scanned = $scanned, n.scan_source = $source, " + TAG_FINGERPRINT.replace("$var", "n").replace("$fingerprint", "row.fingerprint") + ", " + TAG_GENERATION.replace("$var", "n") # stamps used by purge.py
+MERGE_EDGES_QUERY = "UNWIND $rows AS row MATCH (a:$source_label {$source_key: row.source}) MATCH (b:$target_label {$target_key: row.target}) MERGE (a)-[r:$rel_type]->(b) SET " + TAG_GENERATION.replace("$var", "r")
+MERGE_FINDINGS_QUERY = "UNWIND $rows AS row MATCH (n:$label {$key: row.value}) MERGE (f:Finding {fid: row.fid}) ON CREATE SET f.uid = row.uid, f.vuln_id = row.vuln_id, f.artifact = row.artifact, f.entity = row.value, f.entity_label = '$label', f.first_seen = row.seen SET f.last_seen = row.seen, " + TAG_GENERATION.replace("$var", "f") + " MERGE (n)-[r:AFFECTED_BY]->(f) SET " + TAG_GENERATION.replace("$var", "r")
+# relationships of an unchanged entity that were live in the previous generation, and the nodes at their other end, stay in the new one.
+# The nodes count as scanned now, purge.py --older-than would otherwise delete them while they are still shown
+CARRY_FORWARD_QUERY = "UNWIND $rows AS row MATCH (n:$label {$key: row.value})-[r:$rel_types]-(o) WHERE $previous IN coalesce(r.generations, []) SET " + TAG_GENERATION.replace("$var", "r") + " WITH DISTINCT o SET o.last_scanned = $scanned, " + TAG_FINGERPRINT.replace("$var", "o").replace("$fingerprint", "coalesce(o.fingerprints[-1], '')") + ", " + TAG_GENERATION.replace("$var", "o")
+BUMP_GENERATION_QUERY = "MERGE (c:Scan_Counter {name: 'scans'}) SET c.generation = coalesce(c.generation, 0) + 1 RETURN c.generation"
+# Scan_Counter.generation keys the web app's query cache, Scan_Counter.live lists the published scan generation of every scanner and source
+ALLOCATE_GENERATION_QUERY = "MERGE (c:Scan_Counter {name: 'scans'}) SET c.allocated = coalesce(c.allocated, 0) + 1 WITH c CREATE (g:Scan_Generation {gid: c.allocated, scanner: $scanner, source: $source, status: 'running', started: $started}) WITH c, g OPTIONAL MATCH (p:Scan_Generation {scanner: $scanner, source: $source}) WHERE p.gid IN coalesce(c.live, []) RETURN g.gid, max(p.gid), coalesce(c.live, [])"
+PUBLISH_GENERATION_QUERY = "MERGE (c:Scan_Counter {name: 'scans'}) SET c.generation = coalesce(c.generation, 0) + 1 WITH c MATCH (g:Scan_Generation {gid: $gid}) OPTIONAL MATCH (p:Scan_Generation {scanner: g.scanner, source: g.source}) WHERE p.gid IN coalesce(c.live, []) AND p.gid <> g.gid WITH c, g, collect(p.gid) AS superseded SET g.status = 'published', g.finished = coalesce(g.finished, $finished), c.live = [gid IN coalesce(c.live, []) WHERE NOT gid IN superseded AND gid <> g.gid] + g.gid RETURN c.generation"
+# the web app's findings total, kept on the counter so a page doesn't count every visible finding. Run whenever live or the findings change
+COUNT_VISIBLE_FINDINGS_QUERY = "MERGE (c:Scan_Counter {name: 'scans'}) WITH c CALL { WITH c MATCH (f:Finding) WHERE f.generations IS NULL OR any(gen IN f.generations WHERE gen IN coalesce(c.live, [])) RETURN count(f) AS visible } SET c.visible_findings = visible RETURN visible"
+RETENTION_QUERY = "OPTIONAL MATCH (c:Scan_Counter {name: 'scans'}) RETURN coalesce(c.allocated, 0) - $retention, coalesce(c.live, [])"
+ABANDON_GENERATION_QUERY = "MATCH (g:Scan_Generation {gid: $gid}) SET g.status = 'abandoned', g.finished = $finished"
+FINDING_SCHEMA_QUERIES = [
+	"CREATE CONSTRAINT finding_fid IF NOT EXISTS FOR (f:Finding) REQUIRE f.fid IS UNIQUE",
+	"CREATE INDEX finding_vuln_id IF NOT EXISTS FOR (f:Finding) ON (f.vuln_id)",
+	"CREATE INDEX finding_entity_label IF NOT EXISTS FOR (f:Finding) ON (f.entity_label)",
+	"CREATE INDEX finding_entity IF NOT EXISTS FOR (f:Finding) ON (f.entity)",
+]
+
+SHOW_INDEXES_QUERY = "SHOW INDEXES YIELD labelsOrTypes, properties, type RETURN labelsOrTypes, properties, type"
+SHOW_CONSTRAINTS_QUERY = "SHOW CONSTRAINTS YIELD labelsOrTypes, properties, type RETURN labelsOrTypes, properties, type"
+LOOKUP_INDEX_TYPES = ["RANGE", "BTREE"] # index types an equality MERGE can use
+
+
+def declared_schema(classes):
+	# (label, property, "unique" or "index") for every unique_index/index of the StructuredNode classes, uid isn't looked up by anything
+	schema = []
+	for cls in classes:
+		for name, prop in cls.defined_properties(aliases=False, rels=False).items():
+			if isinstance(prop, UniqueIdProperty):
+				continue
+			if prop.unique_index:
+				schema.append((cls.__label__, name, "unique"))
+			elif prop.index:
+				schema.append((cls.__label__, name, "index"))
+	return schema
+
+def installed_schema():
+	# (label, property) -> "unique" or "index" for the single property indexes and uniqueness constraints in Neo4j
+	installed = {}
+	results, columns = db.cypher_query(SHOW_INDEXES_QUERY)
+	for labels, properties, index_type in results:
+		if labels and properties and len(properties) == 1 and index_type in LOOKUP_INDEX_TYPES:
+			installed[(labels[0], properties[0])] = "index"
+	results, columns = db.cypher_query(SHOW_CONSTRAINTS_QUERY)
+	for labels, properties, constraint_type in results:
+		if labels and properties and len(properties) == 1 and "UNIQUE" in constraint_type:
+			installed[(labels[0], properties[0])] = "unique"
+	return installed
+
+def missing_schema(declared):
+	installed = installed_schema()
+	return [(label, key, kind) for label, key, kind in declared if installed.get((label, key)) != kind and installed.get((label, key)) != "unique"]
+
+def retained_generations(retention=GENERATION_RETENTION):
+	# {"live": ..., "floor": ...}: generations after floor and the live ones are kept, older runs can't be diffed or published
+	results, columns = db.cypher_query(RETENTION_QUERY, {"retention": retention})
+	floor, live = results[0]
+	return {"live": live, "floor": floor}
+
+def fingerprint(props):
+	# what changed between two generations is found by comparing these
+	return hashlib.sha1(json.dumps(props, sort_keys=True).encode()).hexdigest()
+
+
+class NodeRef(namedtuple("NodeRef", ["label", "key", "value"])):
+	# Handle to a buffered node: the label plus the property it is merged on
+
+	def __str__(self):
+		return str(self.value)
+
+
+class GraphWriter(object):
+	"""
+	Buffers nodes, relationships and findings and writes them with
+	parameterized UNWIND ... MERGE statements, one transaction per batch.
+
+	Nodes are merged on a single lookup key and get the properties of the
+	latest scan on every merge, a property a scan doesn't report keeps its
+	old value.
+
+	Findings are Finding nodes linked with (entity)-[:AFFECTED_BY]->(finding)
+	and identified by a hash of entity, vuln_id and artifact, so a rescan
+	only moves last_seen instead of adding another copy.
+
+	Everything written is tagged with the run's scan generation. The web app
+	only shows the published generation of every scanner and source, close()
+	publishes this one in a single transaction. A run that ends without
+	close() - an exception, an interrupted scan - is left unpublished.
+	The generation lists only keep the live generations and the latest
+	GENERATION_RETENTION, older entries are dropped as things are written.
+	"""
+
+	def __init__(self, batch_size=GRAPH_BATCH_SIZE, source=None, scanner=None):
+		self.batch_size = batch_size
+		self.source = source # server or organization the scan reads, stamped on every node it writes
+		self.scanner = scanner # jenkins, jfrog, github or actions: generations of one scanner and source supersede each other
+		self.lock = threading.RLock()
+		self.nodes = {} # (label, key) -> {value: props}
+		self.edges = {} # (source label, source key, rel type, target label, target key) -> set of (source, target)
+		self.findings = {} # (label, key) -> {fid: row}
+		self.carried = {} # (label, key, rel types) -> set of values
+		self.pending = 0
+		self.nodes_written = 0
+		self.edges_written = 0
+		self.findings_written = 0
+		self.batches = 0
+		self.closed = False
+		self.schema_ready = False
+		self.scan_time = time.time() # last_scanned of every node and last_seen of every finding written in this run
+		self.generation = None
+		self.scan_generation = None # Scan_Generation.gid of this run, allocated on the first flush
+		self.previous_generation = None # published generation of the same scanner and source when this run started
+		self.retained = None # {"live": ..., "floor": ...}, the generations kept in the lists of everything this run writes
+		atexit.register(self.abandon)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close(publish=exc_type is None)
+
+	def verify_schema(self):
+		"""
+		Checks the lookup keys declared with unique_index/index on the
+		StructuredNode classes loaded by the scanner against Neo4j. Without
+		them every MERGE is a label scan, `python manage.py install_schema`
+		installs them. Returns the missing (label, key, kind).
+		"""
+		try:
+			missing = missing_schema(declared_schema(StructuredNode.__subclasses__()))
+		except Exception as ex:
+			print("\033[93m [?] Could not verify the graph schema: " + str(ex) + "\033[00m")
+			return []
+		for label, key, kind in missing:
+			print("\033[93m [?] No " + ("uniqueness constraint" if kind == "unique" else "index") + " on " + label + "." + key + ", run `python manage.py install_schema`\033[00m")
+		if not missing:
+			print("[*] Graph schema: every lookup key is indexed")
+		return missing
+
+	def merge_node(self, label, key, data):
+		props = {}
+		for name in data:
+			if data[name] is not None:
+				props[name] = str(data[name]) # same normalisation as StringProperty
+		if key not in props:
+			# nothing to MERGE on, the node and everything later linked to it are skipped
+			print("\033[93m [?] " + label + " without a " + key + " skipped\033[00m")
+			return None
+		ref = NodeRef(label, key, props[key])
+		with self.lock:
+			bucket = self.nodes.setdefault((label, key), {})
+			if ref.value not in bucket:
+				bucket[ref.value] = props
+				self._added()
+			else:
+				bucket[ref.value].update(props) # the same entity reported twice in one batch
+		return ref
+
+	def merge_edge(self, source, rel_type, target):
+		if source is None or target is None:
+			return # an end merge_node() skipped
+		with self.lock:
+			bucket = self.edges.setdefault((source.label, source.key, rel_type, target.label, target.key), set())
+			if (source.value, target.value) not in bucket:
+				bucket.add((source.value, target.value))
+				self._added()
+		return
+
+	def add_finding(self, ref, vuln_id, artifact):
+		if ref is None:
+			return
+		row = {"value": ref.value, "vuln_id": str(vuln_id), "artifact": str(artifact), "seen": self.scan_time}
+		row["fid"] = hashlib.sha1("|".join([ref.label, ref.key, row["value"], row["vuln_id"], row["artifact"]]).encode()).hexdigest()
+		with self.lock:
+			bucket = self.findings.setdefault((ref.label, ref.key), {})
+			if row["fid"] not in bucket:
+				bucket[row["fid"]] = row
+				self._added()
+		return
+
+	def carry_forward(self, ref, rel_types):
+		"""
+		For incremental scans: keeps the relationships of ref with one of
+		rel_types, and the nodes at their other end, that were part of the
+		previous generation, e.g. the builds of a job whose builds weren't
+		fetched again because nothing changed.
+		"""
+		if ref is None:
+			return
+		with self.lock:
+			bucket = self.carried.setdefault((ref.label, ref.key, "|".join(rel_types)), set())
+			if ref.value not in bucket:
+				bucket.add(ref.value)
+				self._added()
+		return
+
+	def _added(self):
+		self.pending += 1
+		if self.pending >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		with self.lock:
+			if self.pending == 0:
+				return
+			if not self.schema_ready:
+				# schema changes can't share a transaction with writes
+				for query in FINDING_SCHEMA_QUERIES:
+					db.cypher_query(query)
+				self.schema_ready = True
+			if self.scan_generation is None:
+				results, columns = db.cypher_query(ALLOCATE_GENERATION_QUERY, {"scanner": str(self.scanner), "source": str(self.source), "started": self.scan_time})
+				self.scan_generation, self.previous_generation, live = results[0]
+				self.retained = {"live": live, "floor": self.scan_generation - GENERATION_RETENTION}
+			gen = self.scan_generation
+			# nodes first so that relationships and updates in the same batch can MATCH them
+			with db.transaction:
+				for (label, key), bucket in self.nodes.items():
+					rows = [{"value": value, "uid": uuid.uuid4().hex, "props": props, "fingerprint": fingerprint(props)} for value, props in bucket.items()]
+					db.cypher_query(MERGE_NODES_QUERY.replace("$label", label).replace("$key", key), dict(self.retained, rows=rows, scanned=self.scan_time, source=self.source, gen=gen))
+					self.nodes_written += len(rows)
+				for (source_label, source_key, rel_type, target_label, target_key), bucket in self.edges.items():
+					rows = [{"source": source, "target": target} for source, target in bucket]
+					db.cypher_query(MERGE_EDGES_QUERY.replace("$source_label", source_label).replace("$source_key", source_key).replace("$rel_type", rel_type).replace("$target_label", target_label).replace("$target_key", target_key), dict(self.retained, rows=rows, gen=gen))
+					self.edges_written += len(rows)
+				for (label, key), bucket in self.findings.items():
+					rows = [dict(row, uid=uuid.uuid4().hex) for row in bucket.values()]
+					db.cypher_query(MERGE_FINDINGS_QUERY.replace("$label", label).replace("$key", key), dict(self.retained, rows=rows, gen=gen))
+					self.findings_written += len(rows)
+				if self.previous_generation is not None:
+					for (label, key, rel_types), bucket in self.carried.items():
+						rows = [{"value": value} for value in bucket]
+						db.cypher_query(CARRY_FORWARD_QUERY.replace("$label", label).replace("$key", key).replace("$rel_types", rel_types), dict(self.retained, rows=rows, gen=gen, previous=self.previous_generation, scanned=self.scan_time))
+			self.nodes = {}
+			self.edges = {}
+			self.findings = {}
+			self.carried = {}
+			self.pending = 0
+			self.batches += 1
+		return
+
+	def stats(self):
+		return {
+			"nodes_written": self.nodes_written,
+			"edges_written": self.edges_written,
+			"findings_written": self.findings_written,
+			"batches": self.batches,
+			"generation": self.generation,
+			"scan_generation": self.scan_generation,
+		}
+
+	def close(self, publish=True):
+		with self.lock:
+			if self.closed:
+				return
+			self.flush()
+			self.closed = True
+			if self.batches > 0:
+				if publish:
+					# swaps this run in for the previous one of the same scanner and source, and tells the web app that its cached query results are stale
+					with db.transaction:
+						results, columns = db.cypher_query(PUBLISH_GENERATION_QUERY, {"gid": self.scan_generation, "finished": time.time()})
+						db.cypher_query(COUNT_VISIBLE_FINDINGS_QUERY)
+					self.generation = results[0][0]
+				else:
+					db.cypher_query(ABANDON_GENERATION_QUERY, {"gid": self.scan_generation, "finished": time.time()})
+		print("[*] Graph writer: " + str(self.nodes_written) + " nodes, " + str(self.edges_written) + " relationships, " + str(self.findings_written) + " findings in " + str(self.batches) + " batches, scan generation " + str(self.scan_generation) + (" published" if publish else " left unpublished"))
+		return
+
+	def abandon(self):
+		# atexit: whatever is still buffered is written, but a scan that never reached close() isn't published
+		if self.batches == 0 and self.pending == 0:
+			self.closed = True # never wrote anything, e.g. a module copy in a spawned parse process
+			return
+		self.close(publish=False)
+		return
@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Global Variables
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "5"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "1.0"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_RETRY_DELAY = 60.0
+PACE_BELOW_REMAINING = 500 # start spreading requests over the rate-limit window below this budget
+
+
+class TokenBucket(object):
+	# allows `rate` requests per second on average with bursts of up to `burst`
+
+	def __init__(self, rate, burst):
+		self.rate = float(rate)
+		self.capacity = float(burst)
+		self.tokens = float(burst)
+		self.updated = time.time()
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		while True:
+			with self.lock:
+				now = time.time()
+				self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+				if self.tokens >= 1:
+					self.tokens -= 1
+					return
+				wait = (1 - self.tokens) / self.rate
+			time.sleep(wait)
+
+
+class HttpClient(object):
+	"""
+	One keep-alive session and connection pool per host, retries with
+	jittered exponential backoff, and pacing against the X-RateLimit-*
+	budget reported by the server instead of fixed sleeps.
+	"""
+
+	def __init__(self, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, timeout=HTTP_TIMEOUT):
+		self.pool_size = pool_size
+		self.retries = retries
+		self.backoff = backoff
+		self.timeout = timeout
+		self.lock = threading.Lock()
+		self.sessions = {}
+		self.budgets = {} # host -> (remaining, reset epoch)
+		self.next_slot = {} # host -> earliest time the next request may start
+		self.buckets = {} # host -> TokenBucket, for servers that don't report a rate-limit budget
+		self.stats = {}
+
+	def session(self, host):
+		with self.lock:
+			if host not in self.sessions:
+				session = requests.Session()
+				adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+				session.mount("http://", adapter)
+				session.mount("https://", adapter)
+				self.sessions[host] = session
+				self.stats[host] = {"requests": 0, "retries": 0, "errors": 0, "latency": 0.0, "max_latency": 0.0, "statuses": {}}
+			return self.sessions[host]
+
+	def set_rate(self, url, rate, burst=None):
+		host = urlparse(url).netloc
+		with self.lock:
+			self.buckets[host] = TokenBucket(rate, burst or rate)
+		return
+
+	def get(self, url, **kwargs):
+		return self.request("GET", url, **kwargs)
+
+	def post(self, url, **kwargs):
+		return self.request("POST", url, **kwargs)
+
+	def request(self, method, url, **kwargs):
+		host = urlparse(url).netloc
+		session = self.session(host)
+		kwargs.setdefault("timeout", self.timeout)
+		attempt = 0
+		while True:
+			self.pace(host)
+			started = time.time()
+			try:
+				response = session.request(method, url, **kwargs)
+			except (requests.ConnectionError, requests.Timeout) as ex:
+				self.record(host, time.time() - started, None)
+				if attempt >= self.retries:
+					raise
+				attempt += 1
+				self.retry(host, self.backoff_delay(attempt))
+				continue
+
+			self.record(host, time.time() - started, response.status_code)
+			self.update_budget(host, response)
+			if attempt < self.retries and (response.status_code in RETRY_STATUS or self.rate_limited(response)):
+				attempt += 1
+				response.close()
+				self.retry(host, self.retry_delay(response, attempt))
+				continue
+			return response
+
+	def rate_limited(self, response):
+		return response.status_code == 403 and response.headers.get("X-RateLimit-Remaining") == "0"
+
+	def backoff_delay(self, attempt):
+		return min(MAX_RETRY_DELAY, self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+	def retry_delay(self, response, attempt):
+		if "Retry-After" in response.headers:
+			try:
+				return min(MAX_RETRY_DELAY, float(response.headers["Retry-After"]))
+			except ValueError:
+				pass
+		if response.headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in response.headers:
+			return max(0.0, float(response.headers["X-RateLimit-Reset"]) - time.time()) + 1
+		return self.backoff_delay(attempt)
+
+	def retry(self, host, delay):
+		with self.lock:
+			self.stats[host]["retries"] += 1
+		time.sleep(delay)
+
+	def update_budget(self, host, response):
+		if "X-RateLimit-Remaining" in response.headers and "X-RateLimit-Reset" in response.headers:
+			with self.lock:
+				self.budgets[host] = (int(response.headers["X-RateLimit-Remaining"]), float(response.headers["X-RateLimit-Reset"]))
+
+	def pace(self, host):
+		if host in self.buckets:
+			self.buckets[host].acquire()
+		# spread what is left of the budget evenly until the window resets
+		with self.lock:
+			now = time.time()
+			delay = 0.0
+			if host in self.budgets:
+				remaining, reset = self.budgets[host]
+				if remaining < PACE_BELOW_REMAINING and reset > now:
+					delay = (reset - now) / max(remaining, 1)
+			start = max(now, self.next_slot.get(host, now))
+			self.next_slot[host] = start + delay
+		if start > now:
+			time.sleep(start - now)
+
+	def record(self, host, latency, status):
+		with self.lock:
+			stats = self.stats[host]
+			stats["requests"] += 1
+			stats["latency"] += latency
+			stats["max_latency"] = max(stats["max_latency"], latency)
+			if status is None:
+				stats["errors"] += 1
+			else:
+				stats["statuses"][status] = stats["statuses"].get(status, 0) + 1
+
+	def dump_stats(self):
+		with self.lock:
+			for host, stats in self.stats.items():
+				average = stats["latency"] / stats["requests"] if stats["requests"] else 0.0
+				print("[*] HTTP " + host + ": " + str(stats["requests"]) + " requests, " + str(stats["retries"]) + " retries, " + str(stats["errors"]) + " errors, avg " + str(round(average * 1000)) + "ms, max " + str(round(stats["max_latency"] * 1000)) + "ms, statuses " + str(stats["statuses"]))
+		return
+
+
+HTTP = HttpClient()
@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+
+import requests
+
+# Global Variables
+CONSOLE_QUERY = "logText/progressiveText?start=$start"
+
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_LENGTH = 4096 # longer lines are cut in excerpts and matched in windows, keeps the carry-over buffer bounded
+MATCH_WINDOW = 2 * MAX_LINE_LENGTH # a long line is matched MATCH_WINDOW bytes at a time, windows overlap by MAX_LINE_LENGTH
+MAX_EXCERPTS = 50
+
+CONSOLE_PATTERNS = [
+	re.compile(r"\${{[\w. ]*}}"), # same expression views.analyze() looks for
+	re.compile(r"git@[\w.-]+:[\w.-]+/[\w.-]+"), # git fetch --tags --progress git@github.com:org/repo.git
+	re.compile(r"https?://[\w.@:-]+/[\w.-]+/[\w.-]+\.git"),
+]
+
+
+class ConsoleBlobStore(object):
+	"""
+	Compressed, content-addressed store for full console logs:
+	<directory>/<sha256[:2]>/<sha256>.log.gz, identical logs are kept once.
+	"""
+
+	def __init__(self, directory):
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+
+	def open(self):
+		handle = tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False)
+		return handle, gzip.GzipFile(fileobj=handle, mode="wb")
+
+	def commit(self, handle, blob, digest):
+		blob.close()
+		handle.close()
+		path = os.path.join(self.directory, digest[:2], digest + ".log.gz")
+		if os.path.exists(path):
+			os.remove(handle.name)
+		else:
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+			os.replace(handle.name, path)
+		return path
+
+	def discard(self, handle, blob):
+		blob.close()
+		handle.close()
+		os.remove(handle.name)
+
+
+class ConsoleMatcher(object):
+	"""
+	Finds the console lines matching CONSOLE_PATTERNS in a log fed chunk by
+	chunk, one excerpt per line prefixed with its line number. A line longer
+	than MAX_LINE_LENGTH stays one line: it is matched in overlapping windows,
+	so a match across a window edge isn't lost, and its excerpt is cut to
+	MAX_LINE_LENGTH around the match.
+	"""
+
+	def __init__(self):
+		self.excerpts = []
+		self.line_number = 1
+		self.window = b"" # part of the current line not matched yet, after the overlap kept from the last window
+		self.long_line = False
+		self.matched = False # the current line already has its excerpt
+
+	def feed(self, chunk):
+		parts = chunk.split(b"\n")
+		for part in parts[:-1]:
+			self.extend(part)
+			self.end_line()
+		self.extend(parts[-1])
+
+	def extend(self, data):
+		self.window += data
+		while len(self.window) > MATCH_WINDOW:
+			self.long_line = True
+			self.match(self.window[:MATCH_WINDOW])
+			self.window = self.window[MATCH_WINDOW - MAX_LINE_LENGTH:]
+
+	def end_line(self):
+		if self.window or self.long_line:
+			self.match(self.window)
+		self.window = b""
+		self.long_line = False
+		self.matched = False
+		self.line_number += 1
+
+	def finish(self):
+		if self.window:
+			self.end_line()
+		return self.excerpts
+
+	def match(self, data):
+		if self.matched or len(self.excerpts) >= MAX_EXCERPTS:
+			return
+		text = data.decode("utf-8", errors="replace")
+		for pattern in CONSOLE_PATTERNS:
+			found = pattern.search(text)
+			if found:
+				if len(text) > MAX_LINE_LENGTH:
+					start = max(0, min(found.start() - MAX_LINE_LENGTH // 4, len(text) - MAX_LINE_LENGTH))
+					text = text[start:start + MAX_LINE_LENGTH]
+				self.excerpts.append(str(self.line_number) + ": " + text.strip())
+				self.matched = True
+				return
+
+
+def stream_console(build_url, auth, blob_store=None, session=requests):
+	"""
+	Reads a build log from progressiveText chunk by chunk and keeps only the
+	lines matching CONSOLE_PATTERNS plus a sha256 of the whole log, so memory
+	and the stored node stay bounded whatever the log size.
+	"""
+	digest = hashlib.sha256()
+	size = 0
+	matcher = ConsoleMatcher()
+
+	if blob_store:
+		handle, blob = blob_store.open()
+
+	try:
+		url = build_url.rstrip("/") + "/" + CONSOLE_QUERY.replace("$start", "0")
+		with session.get(url, auth=auth, stream=True) as response:
+			response.raise_for_status()
+			for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+				if not chunk:
+					continue
+				digest.update(chunk)
+				size += len(chunk)
+				if blob_store:
+					blob.write(chunk)
+				matcher.feed(chunk)
+		excerpts = matcher.finish()
+	except Exception:
+		if blob_store:
+			blob_store.discard(handle, blob)
+		raise
+
+	consoledata = {}
+	consoledata["output"] = "\n".join(excerpts)
+	consoledata["output_sha256"] = digest.hexdigest()
+	consoledata["output_size"] = size
+	consoledata["output_blob"] = ""
+	if blob_store:
+		consoledata["output_blob"] = blob_store.commit(handle, blob, consoledata["output_sha256"])
+	return consoledata
@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import time
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from action_rules import CODEOWNERS_PATHS, evaluate_codeowners, evaluate_workflow
+
+# Global Variables
+WORKFLOWS_DIRECTORY = ".github/workflows"
+WORKFLOW_PATTERN = re.compile(r"^(.*/)?\.github/workflows/[^/]+\.ya?ml$") # GitHub only reads files directly in .github/workflows
+TARBALL_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# Evaluates the workflow rules of action_rules.py against repositories on
+# disk - checkouts, bare git mirrors and tarballs - without GitHub or Neo4j.
+# The settings rules (SIA011, SIA015, SIA016) need the GitHub API and are
+# only run by github_action_scanner.py.
+
+
+# status goes to stderr, stdout only carries the findings JSON
+def warning_print(message):
+	print("\033[93m {}\033[00m" .format(message), file=sys.stderr)
+
+def error_print(message):
+	print("\033[91m {}\033[00m" .format(message), file=sys.stderr)
+
+def success_print(message):
+	print("\033[32m {}\033[00m" .format(message), file=sys.stderr)
+
+def strip_suffix(name):
+	for suffix in TARBALL_SUFFIXES + (".git",):
+		if name.endswith(suffix):
+			return name[:-len(suffix)]
+	return name
+
+def is_bare_mirror(path):
+	return os.path.isfile(os.path.join(path,"HEAD")) and os.path.isdir(os.path.join(path,"objects")) and os.path.isdir(os.path.join(path,"refs"))
+
+def is_checkout(path):
+	return os.path.exists(os.path.join(path,".git")) or os.path.isdir(os.path.join(path,WORKFLOWS_DIRECTORY))
+
+def discover_sources(root):
+	# (kind, path) of every checkout, bare mirror and tarball under root
+	if os.path.isfile(root):
+		return [("tarball", root)]
+	if is_bare_mirror(root):
+		return [("mirror", root)]
+	if is_checkout(root):
+		return [("checkout", root)]
+
+	sources = []
+	for dirpath, dirnames, filenames in os.walk(root):
+		for filename in filenames:
+			if filename.endswith(TARBALL_SUFFIXES):
+				sources.append(("tarball", os.path.join(dirpath, filename)))
+		kept = []
+		for dirname in sorted(dirnames):
+			path = os.path.join(dirpath, dirname)
+			if is_bare_mirror(path):
+				sources.append(("mirror", path))
+			elif is_checkout(path):
+				sources.append(("checkout", path))
+			else:
+				kept.append(dirname)
+		dirnames[:] = kept # nothing inside a repository is walked again
+	return sources
+
+
+def read_checkout(path):
+	workflows = {}
+	directory = os.path.join(path, WORKFLOWS_DIRECTORY)
+	if os.path.isdir(directory):
+		for filename in sorted(os.listdir(directory)):
+			if WORKFLOW_PATTERN.match(WORKFLOWS_DIRECTORY + "/" + filename) and os.path.isfile(os.path.join(directory, filename)):
+				with open(os.path.join(directory, filename), encoding="utf-8", errors="replace") as workflow_file:
+					workflows[WORKFLOWS_DIRECTORY + "/" + filename] = workflow_file.read()
+	codeowners = [codeowners_path for codeowners_path in CODEOWNERS_PATHS if os.path.isfile(os.path.join(path, codeowners_path))]
+	return [(os.path.basename(os.path.abspath(path)), workflows, codeowners)]
+
+def read_mirror(path):
+	# one ls-tree for the paths we need and one cat-file --batch for all workflow blobs of HEAD
+	name = strip_suffix(os.path.basename(os.path.abspath(path)))
+	listing = subprocess.run(["git", "--git-dir", path, "ls-tree", "HEAD", "--", WORKFLOWS_DIRECTORY + "/"] + CODEOWNERS_PATHS, capture_output=True, text=True)
+	if listing.returncode != 0:
+		return [] # empty repository, HEAD doesn't resolve
+
+	blobs = {} # sha -> workflow paths
+	codeowners = []
+	for line in listing.stdout.splitlines():
+		meta, entry_path = line.split("\t", 1)
+		mode, entry_type, sha = meta.split()
+		if entry_type != "blob":
+			continue
+		if entry_path in CODEOWNERS_PATHS:
+			codeowners.append(entry_path)
+		elif WORKFLOW_PATTERN.match(entry_path):
+			blobs.setdefault(sha, []).append(entry_path) # identical files share a blob
+
+	workflows = {}
+	if blobs:
+		batch = subprocess.run(["git", "--git-dir", path, "cat-file", "--batch"], input=("\n".join(blobs) + "\n").encode(), capture_output=True, check=True)
+		output = batch.stdout
+		position = 0
+		while position < len(output):
+			header_end = output.index(b"\n", position)
+			sha, entry_type, size = output[position:header_end].decode().split()
+			content = output[header_end + 1:header_end + 1 + int(size)]
+			position = header_end + 1 + int(size) + 1
+			for entry_path in blobs[sha]:
+				workflows[entry_path] = content.decode("utf-8", errors="replace")
+	return [(name, workflows, codeowners)]
+
+def read_tarball(path):
+	# an archive can hold one or more repositories, each under its own prefix (e.g. repo-<sha>/ for GitHub archives)
+	workflows = {} # prefix -> {workflow path: text}
+	names = set()
+	with tarfile.open(path) as archive:
+		for member in archive:
+			if not member.isfile():
+				continue
+			member_name = member.name[2:] if member.name.startswith("./") else member.name
+			names.add(member_name)
+			match = WORKFLOW_PATTERN.match(member_name)
+			if match:
+				prefix = match.group(1) or ""
+				workflows.setdefault(prefix, {})[member_name[len(prefix):]] = archive.extractfile(member).read().decode("utf-8", errors="replace")
+
+	# a repository without workflows still gets GHA001, like a checkout: when every repository with
+	# workflows sits in a top-level directory, so does every other one; no workflows at all is one repository
+	top_level = set([member_name.split("/", 1)[0] + "/" for member_name in names if "/" in member_name])
+	prefixes = set(workflows)
+	if not prefixes:
+		prefixes = top_level if len(top_level) == 1 and all(["/" in member_name for member_name in names]) else set([""])
+	elif all([prefix in top_level for prefix in prefixes]):
+		prefixes |= top_level
+
+	repositories = []
+	for prefix in sorted(prefixes):
+		codeowners = [codeowners_path for codeowners_path in CODEOWNERS_PATHS if prefix + codeowners_path in names]
+		repositories.append((prefix.rstrip("/") or strip_suffix(os.path.basename(path)), workflows.get(prefix, {}), codeowners))
+	return repositories
+
+READERS = {
+	"checkout": read_checkout,
+	"mirror": read_mirror,
+	"tarball": read_tarball,
+}
+
+
+def scan_source(kind,path,private):
+	# runs in a worker process: read, parse and evaluate every repository of one source
+	started = time.time()
+	sourcedata = {}
+	sourcedata["source"] = path
+	sourcedata["repositories"] = 0
+	sourcedata["workflows"] = 0
+	sourcedata["findings"] = []
+	sourcedata["errors"] = []
+
+	for repository, workflows, codeowners in READERS[kind](path):
+		sourcedata["repositories"] += 1
+
+		# GHA001
+		for vuln_data in evaluate_codeowners(repository,codeowners):
+			vuln_data["repository"] = repository
+			vuln_data["source"] = path
+			sourcedata["findings"].append(vuln_data)
+
+		for workflow_path in sorted(workflows):
+			sourcedata["workflows"] += 1
+			try:
+				workflow_data = yaml.safe_load(workflows[workflow_path])
+			except yaml.YAMLError as ex:
+				sourcedata["errors"].append(repository + "/" + workflow_path + ": " + str(ex))
+				continue
+			if not isinstance(workflow_data, dict):
+				sourcedata["errors"].append(repository + "/" + workflow_path + ": not a workflow")
+				continue
+
+			# same name the Actions API reports, the file path when the workflow has none
+			workflow_name = workflow_data.get("name") or workflow_path
+			findings, errors = evaluate_workflow(workflow_name,workflow_data,private)
+			for vuln_data in findings:
+				vuln_data["repository"] = repository
+				vuln_data["source"] = path
+				vuln_data["file"] = workflow_path
+				sourcedata["findings"].append(vuln_data)
+			for error in errors:
+				sourcedata["errors"].append(repository + "/" + workflow_path + " " + error)
+
+	sourcedata["elapsed"] = time.time() - started
+	return sourcedata
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser()
+	parser.add_argument("paths", nargs="+", help="Checkouts, bare git mirrors, tarballs or directories holding any of them")
+	parser.add_argument("--visibility", choices=["public", "private"], help="Repository visibility for SIA003/SIA004 (default: skip both)")
+	parser.add_argument("-p","--processes", type=int, default=os.cpu_count() or 1, help="Number of sources scanned in parallel (default: CPU count)")
+	parser.add_argument("--output", help="Write the findings JSON to this file instead of stdout")
+	parser.add_argument("--fail-on-findings", action="store_true", help="Exit with status 1 when there is any finding, for CI gates")
+	args = parser.parse_args()
+
+	private = None
+	if args.visibility:
+		private = args.visibility == "private"
+
+	sources = []
+	for root in args.paths:
+		sources.extend(discover_sources(root))
+	print("[*] " + str(len(sources)) + " sources discovered", file=sys.stderr)
+
+	OUTPUT = []
+	scan_started = time.time()
+	repositories = 0
+	workflows = 0
+	failed = 0
+	with ProcessPoolExecutor(max_workers=max(args.processes, 1)) as executor:
+		futures = {}
+		for kind, path in sources:
+			futures[executor.submit(scan_source,kind,path,private)] = path
+		for future in as_completed(futures):
+			try:
+				sourcedata = future.result()
+			except Exception as ex:
+				failed += 1
+				error_print("[-] " + str(futures[future]) + ": " + str(ex))
+				continue
+			repositories += sourcedata["repositories"]
+			workflows += sourcedata["workflows"]
+			OUTPUT.extend(sourcedata["findings"])
+			for error in sourcedata["errors"]:
+				warning_print("[?] " + error)
+
+	scan_time = time.time() - scan_started
+	success_print("[*] Evaluated " + str(workflows) + " workflows in " + str(repositories) + " repositories (" + str(failed) + " sources failed) in " + str(round(scan_time, 2)) + "s, " + str(len(OUTPUT)) + " findings")
+
+	if args.output:
+		with open(args.output, "w") as output_file:
+			json.dump(OUTPUT, output_file, indent=2)
+	else:
+		print(json.dumps(OUTPUT, indent = 2))
+
+	if args.fail_on_findings and len(OUTPUT) > 0:
+		sys.exit(1)
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Global Variables
+WORKFLOW_CACHE_DIR = os.getenv("CICDGUARD_WORKFLOW_CACHE", os.path.join(os.path.expanduser("~"), ".cicdguard", "workflows"))
+WORKFLOW_CACHE_MEMORY = int(os.getenv("CICDGUARD_WORKFLOW_CACHE_MEMORY", "2048")) # parsed workflows kept in memory, least recently used go first
+KEY_MARKER = "\u0000" # prefixes the JSON of a key that isn't a string, e.g. the True yaml.safe_load makes of "on:"
+
+
+def encode_keys(value):
+	# JSON only has string keys: True becomes "\u0000true" and is turned back into True by decode_keys()
+	if isinstance(value, dict):
+		return {(key if isinstance(key, str) else KEY_MARKER + json.dumps(key, default=str)): encode_keys(item) for key, item in value.items()}
+	if isinstance(value, list):
+		return [encode_keys(item) for item in value]
+	return value
+
+def decode_keys(value):
+	if isinstance(value, dict):
+		return {(json.loads(key[len(KEY_MARKER):]) if key.startswith(KEY_MARKER) else key): decode_keys(item) for key, item in value.items()}
+	if isinstance(value, list):
+		return [decode_keys(item) for item in value]
+	return value
+
+
+class WorkflowCache(object):
+	"""
+	Parsed workflow files keyed by their git blob SHA. A blob SHA only
+	changes with the file content, so an entry never needs invalidating.
+
+	Entries are stored as JSON, never unpickled: the cache directory can be
+	pointed anywhere and must not be able to run code in the scanner.
+	"""
+
+	def __init__(self, directory=WORKFLOW_CACHE_DIR, memory_size=WORKFLOW_CACHE_MEMORY):
+		self.directory = directory
+		self.memory_size = memory_size
+		self.lock = threading.Lock()
+		self.memory = OrderedDict()
+		self.memory_hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+
+	def path(self, sha):
+		return os.path.join(self.directory, sha[:2], sha + ".json")
+
+	def remember(self, sha, workflow_data):
+		# caller holds the lock
+		self.memory[sha] = workflow_data
+		self.memory.move_to_end(sha)
+		while len(self.memory) > self.memory_size:
+			self.memory.popitem(last=False)
+
+	def get(self, sha, load):
+		# load() downloads and parses the file, only called on a miss
+		with self.lock:
+			if sha in self.memory:
+				self.memory_hits += 1
+				self.memory.move_to_end(sha)
+				return self.memory[sha]
+
+		path = self.path(sha)
+		workflow_data = None
+		if os.path.exists(path):
+			try:
+				with open(path) as cache_file:
+					workflow_data = decode_keys(json.load(cache_file))
+			except ValueError:
+				workflow_data = None # unreadable entry, parsed again and overwritten below
+		if isinstance(workflow_data, dict):
+			with self.lock:
+				self.disk_hits += 1
+				self.remember(sha, workflow_data)
+			return workflow_data
+
+		workflow_data = load()
+		if not isinstance(workflow_data, dict):
+			return workflow_data # an empty or broken file isn't kept, the next scan parses it again
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		handle = tempfile.NamedTemporaryFile(mode="w", dir=os.path.dirname(path), suffix=".tmp", delete=False)
+		with handle:
+			json.dump(encode_keys(workflow_data), handle, default=str) # dates and timestamps yaml.safe_load produces are kept as text
+		os.replace(handle.name, path)
+		with self.lock:
+			self.misses += 1
+			self.remember(sha, workflow_data)
+		return workflow_data
+
+	def stats(self):
+		return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses}